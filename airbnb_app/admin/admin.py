@@ -1,20 +1,20 @@
 from fastapi import Depends, HTTPException, status, APIRouter
 from airbnb_app.api.auth import get_current_user
-from airbnb_app.db.models import UserProfile,Property
-from airbnb_app.db.database import SessionLocal
-from sqlalchemy.orm import Session
+from airbnb_app.db.models import UserProfile, Property
+from airbnb_app.db.database import get_db, async_engine, replica_engine
+from airbnb_app.db.pool import pool_status
+from airbnb_app.services.search_cache import search_cache, property_state
+from airbnb_app.services.principals import principal_cache
+from airbnb_app.services.stats import refresh_stats, get_stats as load_stats
+from airbnb_app.services.occupancy import rebuild_occupancy
+from airbnb_app.services.outbox import outbox_stats
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 
 
 admin_router = APIRouter(prefix="/admin", tags=["Admin"])
 
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 def admin_only(current_user: UserProfile = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(
@@ -25,76 +25,92 @@ def admin_only(current_user: UserProfile = Depends(get_current_user)):
 
 
 @admin_router.put("/user/{user_id}/block", dependencies=[Depends(admin_only)])
-async def block_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(UserProfile).filter(UserProfile.id == user_id).first()
+async def block_user(user_id: int, db: AsyncSession = Depends(get_db)):
+    user = await db.get(UserProfile, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     user.is_active = False
-    db.commit()
+    await db.commit()
+    principal_cache.invalidate(user_id=user.id)
     return {"message": f"User {user.username} заблокирован"}
 
 
 @admin_router.put("/user/{user_id}/unblock")
-async def unblock_user(user_id: int, db: Session = Depends(get_db),
+async def unblock_user(user_id: int, db: AsyncSession = Depends(get_db),
                        current_user: UserProfile = Depends(admin_only)):
-    user = db.query(UserProfile).filter(UserProfile.id == user_id).first()
+    user = await db.get(UserProfile, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     user.is_active = True
-    db.commit()
+    await db.commit()
+    principal_cache.invalidate(user_id=user.id)
     return {"message": f"User {user.username} разблокирован"}
 
 
 @admin_router.put("/property/{property_id}/approve", dependencies=[Depends(admin_only)])
-async def approve_property(property_id: int, db: Session = Depends(get_db)):
-    property_obj = db.query(Property).filter(Property.id == property_id).first()
+async def approve_property(property_id: int, db: AsyncSession = Depends(get_db)):
+    property_obj = await db.get(Property, property_id)
     if not property_obj:
         raise HTTPException(status_code=404, detail="Property not found")
+    before = property_state(property_obj)
     property_obj.is_approved = True
-    db.commit()
+    await db.commit()
+    search_cache.invalidate_property(property_id, before, property_state(property_obj))
     return {"message": "Property approved successfully"}
 
 
 @admin_router.delete("/user/{user_id}", dependencies=[Depends(admin_only)])
-async def delete_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(UserProfile).filter(UserProfile.id == user_id).first()
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_db)):
+    user = await db.get(UserProfile, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    db.delete(user)
-    db.commit()
-
-
-from sqlalchemy import func
+    # their listings go with them (cascade); cached pages that showed them must go too
+    properties = (await db.scalars(select(Property).where(Property.owner_id == user_id))).all()
+    states = [(prop.id, property_state(prop)) for prop in properties]
+    await db.delete(user)
+    await db.commit()
+    principal_cache.invalidate(user_id=user_id)
+    for property_id, before in states:
+        search_cache.invalidate_property(property_id, before)
 
 
 @admin_router.get("/stats")
-async def get_stats(db: Session = Depends(get_db),
+async def get_stats(refresh: bool = False, db: AsyncSession = Depends(get_db),
                     current_user: UserProfile = Depends(admin_only)):
-    total_users = db.query(func.count(UserProfile.id)).scalar()
-    active_users = (db.query(func.count(UserProfile.id)).filter
-                    (UserProfile.is_active == True).scalar())
-    total_bookings = db.query(func.count(Booking.id)).scalar()
-    active_bookings = (db.query(func.count(Booking.id)).filter
-                       (Booking.status == BookingStatusChoices.approved).scalar())
+    # figures come from the admin_stats row kept fresh by refresh_admin_stats; if that loop lags
+    # the row is served stale (see updated_at) -- ?refresh=true recomputes it in the request
+    stats = await (refresh_stats(db) if refresh else load_stats(db))
+    return {
+        "total_users": stats.total_users,
+        "active_users": stats.active_users,
+        "total_bookings": stats.total_bookings,
+        "active_bookings": stats.active_bookings,
+        "popular_cities": stats.popular_cities,
+        "total_revenue": stats.total_revenue,
+        "updated_at": stats.updated_at,
+    }
 
 
-    popular_cities = (
-        db.query(Property.city, func.count(Property.id).label("count"))
-        .group_by(Property.city)
-        .order_by(func.count(Property.id).desc())
-        .limit(5)
-        .all()
-    )
+@admin_router.post("/occupancy/rebuild", dependencies=[Depends(admin_only)])
+async def rebuild_occupancy_bitmaps(db: AsyncSession = Depends(get_db)):
+    # property_occupancy is derived from approved bookings; regenerate it after manual data fixes
+    return {"rows": await rebuild_occupancy(db)}
 
 
-    total_revenue = db.query(func.sum(Booking.total_price)).filter(
-        Booking.status == BookingStatusChoices.approved).scalar() or 0
+@admin_router.get("/outbox", dependencies=[Depends(admin_only)])
+async def get_outbox_stats(db: AsyncSession = Depends(get_db)):
+    # failing > 0 or a growing dead counter means a handler keeps raising, see the logs
+    return await outbox_stats(db)
 
-    return {
-        "total_users": total_users,
-        "active_users": active_users,
-        "total_bookings": total_bookings,
-        "active_bookings": active_bookings,
-        "popular_cities": popular_cities,
-        "total_revenue": total_revenue
-    }
+
+@admin_router.get("/db/pool", dependencies=[Depends(admin_only)])
+async def get_pool_status():
+    pools = {"primary": pool_status(async_engine)}
+    if replica_engine is not async_engine:
+        pools["replica"] = pool_status(replica_engine)
+    return pools
+
+
+@admin_router.get("/cache", dependencies=[Depends(admin_only)])
+async def get_cache_stats():
+    return {"search": search_cache.stats(), "principals": principal_cache.stats()}
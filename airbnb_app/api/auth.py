@@ -1,34 +1,31 @@
-from airbnb_app.db.database import SessionLocal
-from airbnb_app.db.models import UserProfile, RefreshToken
+from airbnb_app.db.database import get_db
+from airbnb_app.db.models import UserProfile
 from airbnb_app.db.schema import UserProfileSchema, UserProfileLoginSchema
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from fastapi import HTTPException, Depends, APIRouter
 from typing import List, Optional
-from passlib.context import CryptContext
 from jose import jwt
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from airbnb_app.cinfig import (ALGORITHM, SECRET_KEY, ACCESS_TOKEN_LIFETIME,
                                REFRESH_TOKEN_LIFETIME)
 from datetime import timedelta, datetime
+from uuid import uuid4
 from jose import JWTError
+from airbnb_app.services.principals import Principal, principal_cache
+from airbnb_app.services.passwords import verify_password, hash_password as get_password_hash
+from airbnb_app.services.tokens import new_refresh_token, find_refresh_token, trim_sessions
 
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 auth_router = APIRouter(prefix='/auth', tags=['Auth'])
 
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> UserProfile:
+async def get_current_user(db: AsyncSession = Depends(get_db),
+                           token: str = Depends(oauth2_scheme)) -> Principal:
     credentials_exception = HTTPException(status_code=401,detail="Could not validate credentials")
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -38,19 +35,21 @@ def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_
     except JWTError:
         raise credentials_exception
 
-    user = db.query(UserProfile).filter(UserProfile.username == username).first()
-    if user is None:
-        raise credentials_exception
-    return user
-
-
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    principal = principal_cache.get(username)
+    if principal is None:
+        row = (await db.execute(
+            select(UserProfile.id, UserProfile.username, UserProfile.role, UserProfile.is_active)
+            .where(UserProfile.username == username)
+        )).first()
+        if row is None:
+            raise credentials_exception
+        principal = Principal(*row)
+        principal_cache.set(principal)
 
+    if not principal.is_active:
+        raise HTTPException(status_code=403, detail="User заблокирован")
+    return principal
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta]= None):
@@ -61,18 +60,20 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta]= None):
 
 
 def create_refresh_token(data: dict):
-    return create_access_token(data, expires_delta=timedelta(days=REFRESH_TOKEN_LIFETIME))
+    # jti keeps two logins in the same second from producing the same token (and digest)
+    return create_access_token({**data, "jti": uuid4().hex},
+                               expires_delta=timedelta(days=REFRESH_TOKEN_LIFETIME))
 
 
 @auth_router.post('/register', response_model=dict)
-async def register(user: UserProfileSchema, db: Session = Depends(get_db)):
-    hash_password = get_password_hash(user.password)
-    user_db = db.query(UserProfile).filter(UserProfile.username == user.username).first()
-    user_email = db.query(UserProfile).filter(UserProfile.email == user.email).first()
+async def register(user: UserProfileSchema, db: AsyncSession = Depends(get_db)):
+    user_db = await db.scalar(select(UserProfile).where(UserProfile.username == user.username))
+    user_email = await db.scalar(select(UserProfile).where(UserProfile.email == user.email))
     if user_db:
         raise HTTPException(status_code=400, detail='username бар экен')
     elif user_email:
         raise HTTPException(status_code=400, detail='email бар экен')
+    hash_password = await get_password_hash(user.password)
     user_db = UserProfile(
         username = user.username,
         email = user.email,
@@ -84,52 +85,59 @@ async def register(user: UserProfileSchema, db: Session = Depends(get_db)):
     )
 
     db.add(user_db)
-    db.commit()
-    db.refresh(user_db)
+    await db.commit()
+    await db.refresh(user_db)
     return {'message': 'Registered'}
 
 
 @auth_router.post('/login')
 async def login(form_data: UserProfileLoginSchema ,
-                db: Session = Depends(get_db)):
-    user = db.query(UserProfile).filter(UserProfile.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password):
+                db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(UserProfile).where(UserProfile.username == form_data.username))
+    if not user:
         raise HTTPException(status_code=401, detail='Малымат туура эмес')
+    valid, new_hash = await verify_password(form_data.password, user.password)
+    if not valid:
+        raise HTTPException(status_code=401, detail='Малымат туура эмес')
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made, saved with the token below
+        user.password = new_hash
 
     access_token = create_access_token({"sub": user.username})
     refresh_token = create_refresh_token({"sub": user.username})
 
-    new_token = RefreshToken(user_id=user.id, token=refresh_token)
-    db.add(new_token)
-    db.commit()
+    db.add(new_refresh_token(user.id, refresh_token))
+    await db.flush()
+    await trim_sessions(db, user.id)
+    await db.commit()
 
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
 @auth_router.post('/logout')
-async def logout(refresh_token: str, db: Session = Depends(get_db)):
+async def logout(refresh_token: str, db: AsyncSession = Depends(get_db)):
 
-    stored_token = db.query(RefreshToken).filter(RefreshToken.token == refresh_token).first()
+    stored_token = await find_refresh_token(db, refresh_token)
 
     if not stored_token:
         raise HTTPException(status_code=401, detail='Малымат туура эмес')
 
-    db.delete(stored_token)
-    db.commit()
+    await db.delete(stored_token)
+    await db.commit()
 
     return {"message": "Вышли"}
 
 
 @auth_router.post('/refresh')
-async def refresh(refresh_token: str,db: Session = Depends(get_db)):
-    stored_token = db.query(RefreshToken).filter(RefreshToken.token == refresh_token).first()
+async def refresh(refresh_token: str,db: AsyncSession = Depends(get_db)):
+    stored_token = await find_refresh_token(db, refresh_token)
     if not stored_token:
         raise HTTPException(status_code=401, detail='Малымат туура эмес')
 
-    user = db.query(UserProfile).filter(UserProfile.id == stored_token.user_id).first()
+    user = await db.get(UserProfile, stored_token.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    access_token = create_access_token({"sub": stored_token.id})
+    access_token = create_access_token({"sub": user.username})
 
     return {"access_token": access_token,"token_type": "bearer"}
\ No newline at end of file
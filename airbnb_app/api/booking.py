@@ -1,23 +1,30 @@
-from airbnb_app.db.database import SessionLocal
-from airbnb_app.db.models import Booking, BookingStatusChoices, Message, Property, UserProfile
+from airbnb_app.db.database import get_db
+from airbnb_app.db.models import Booking, BookingStatusChoices, Property, UserProfile
 from airbnb_app.db.schema import BookingSchema, BookingCreateSchema
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, Depends, APIRouter
-from typing import List
+from typing import List, Optional
 from datetime import datetime, timedelta
 from airbnb_app.api.auth import get_current_user
+from airbnb_app.services.availability import availability_index
+from airbnb_app.services.export import export_format, stream_export
+from airbnb_app.services.serialization import RowEncoder
+from airbnb_app.services.search_cache import search_cache
+from airbnb_app.services import occupancy, outbox
 
 booking_router = APIRouter(prefix="/booking", tags=["Booking"])
+booking_rows = RowEncoder(Booking, BookingSchema)
+
+
+def booking_total(price_per_night: int, check_in: datetime, check_out: datetime) -> int:
+    return price_per_night * max((check_out - check_in).days, 1)
+
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
 @booking_router.post('/create/', response_model=BookingSchema)
-async def create_booking(data: BookingCreateSchema, db: Session = Depends(get_db),
+async def create_booking(data: BookingCreateSchema, db: AsyncSession = Depends(get_db),
                          current_user: UserProfile = Depends(get_current_user)):
     if current_user.role != 'guest':
         raise HTTPException(status_code=403, detail="Only guests can make bookings")
@@ -29,84 +36,115 @@ async def create_booking(data: BookingCreateSchema, db: Session = Depends(get_db
     if (data.check_out - data.check_in).days < 1:
         raise HTTPException(status_code=400, detail='Бронирование должно быть минимум на 1 ночь')
 
-    property_obj = db.query(Property).filter(Property.id == data.property_id).first()
+    property_obj = await db.get(Property, data.property_id)
     if not property_obj:
         raise HTTPException(status_code=404, detail='Property не найден')
 
-    overlapping = db.query(Booking).filter(
+    # one probe of ix_booking_approved_property_check_out; booking_approved_no_overlap
+    # still guards the approval itself
+    overlapping = await db.scalar(select(Booking.id).where(
         Booking.property_id == data.property_id,
         Booking.status == BookingStatusChoices.approved,
         Booking.check_out > data.check_in,
         Booking.check_in < data.check_out
-    ).first()
+    ).limit(1))
     if overlapping:
         raise HTTPException(status_code=409, detail='Этот объект уже забронирован на эту дату')
 
-    new_booking = Booking(**data.dict(), guest_id=current_user.id)
+    new_booking = Booking(**data.dict(exclude={'guest_id'}), guest_id=current_user.id,
+                          total_price=booking_total(property_obj.price_per_night,
+                                                    data.check_in, data.check_out))
     db.add(new_booking)
-    db.commit()
-    db.refresh(new_booking)
-
-    message = Message(
-        status=BookingStatusChoices.pending,
-        booking_id=new_booking.id,
-        renter=property_obj.owner
-    )
-    db.add(message)
-    db.commit()
+    await db.flush()
+    # сообщение хозяину создаёт dispatcher из outbox, запись -- в той же транзакции
+    db.add(outbox.event(outbox.BOOKING_CREATED, booking_id=new_booking.id,
+                        property_id=new_booking.property_id, host_id=property_obj.owner_id))
+    await db.commit()
+    outbox.notify()
 
     return new_booking
 
 @booking_router.get("/", response_model=List[BookingSchema])
-async def list_bookings(db: Session = Depends(get_db),
-                        current_user: UserProfile = Depends(get_current_user)):
-    return db.query(Booking).all()
+async def list_bookings(db: AsyncSession = Depends(get_db),
+                        current_user: UserProfile = Depends(get_current_user),
+                        fmt: Optional[str] = Depends(export_format)):
+    if fmt:
+        return stream_export(select(Booking).order_by(Booking.id), BookingSchema, fmt, 'bookings')
+    result = await db.execute(booking_rows.select())
+    return booking_rows.response(result.all())
 
 @booking_router.get('/{booking_id}/', response_model=BookingSchema)
-async def get_booking(booking_id: int, db: Session = Depends(get_db),
+async def get_booking(booking_id: int, db: AsyncSession = Depends(get_db),
                       current_user: UserProfile = Depends(get_current_user)):
-    booking = db.query(Booking).filter(Booking.id == booking_id).first()
+    booking = await db.get(Booking, booking_id)
     if not booking:
         raise HTTPException(status_code=404, detail='Booking не найден')
     return booking
 
 @booking_router.put('/{booking_id}/', response_model=BookingSchema)
 async def update_booking(booking_id: int, booking_data: BookingCreateSchema,
-                         db: Session = Depends(get_db),
+                         db: AsyncSession = Depends(get_db),
                          current_user: UserProfile = Depends(get_current_user)):
-    booking_db = db.query(Booking).filter(Booking.id == booking_id).first()
+    booking_db = await db.get(Booking, booking_id)
     if booking_db is None:
         raise HTTPException(status_code=404, detail='Booking не найден')
 
     if booking_db.guest_id != current_user.id and current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Нет доступа")
 
+    old_property_id = booking_db.property_id
+    old_years = occupancy.stay_years(booking_db.check_in, booking_db.check_out)
+    was_approved = booking_db.status == BookingStatusChoices.approved
     for booking_key, booking_value in booking_data.dict().items():
         setattr(booking_db, booking_key, booking_value)
 
+    price_per_night = await db.scalar(select(Property.price_per_night)
+                                      .where(Property.id == booking_db.property_id))
+    if price_per_night is None:
+        raise HTTPException(status_code=404, detail='Property не найден')
+    booking_db.total_price = booking_total(price_per_night, booking_db.check_in, booking_db.check_out)
+
     db.add(booking_db)
-    db.commit()
-    db.refresh(booking_db)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail='Этот объект уже забронирован на эту дату')
+    await db.refresh(booking_db)
+    availability_index.sync(booking_db, old_property_id)
+    if was_approved or booking_db.status == BookingStatusChoices.approved:
+        search_cache.invalidate_dates()
+        new_years = occupancy.stay_years(booking_db.check_in, booking_db.check_out)
+        if old_property_id != booking_db.property_id:
+            await occupancy.refresh_occupancy(db, old_property_id, old_years)
+            old_years = set()
+        await occupancy.refresh_occupancy(db, booking_db.property_id, old_years | new_years)
     return booking_db
 
 @booking_router.delete('/{booking_id}/')
-async def delete_booking(booking_id: int, db: Session = Depends(get_db),
+async def delete_booking(booking_id: int, db: AsyncSession = Depends(get_db),
                          current_user: UserProfile = Depends(get_current_user)):
-    booking_db = db.query(Booking).filter(Booking.id == booking_id).first()
+    booking_db = await db.get(Booking, booking_id)
     if booking_db is None:
         raise HTTPException(status_code=404, detail='Booking не найден')
 
     if booking_db.guest_id != current_user.id and current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Нет доступа")
 
-    db.delete(booking_db)
-    db.commit()
+    await db.delete(booking_db)
+    await db.commit()
+    availability_index.discard(booking_db.property_id, booking_db.id)
+    if booking_db.status == BookingStatusChoices.approved:
+        search_cache.invalidate_dates()
+        await occupancy.refresh_occupancy(db, booking_db.property_id,
+                                          occupancy.stay_years(booking_db.check_in, booking_db.check_out))
     return {'message': 'Бронирование успешно удалено'}
 
 @booking_router.get('/guest/{guest_id}/', response_model=List[BookingSchema])
-async def list_bookings_by_guest(guest_id: int, db: Session = Depends(get_db),
+async def list_bookings_by_guest(guest_id: int, db: AsyncSession = Depends(get_db),
                                  current_user: UserProfile = Depends(get_current_user)):
     if current_user.id != guest_id and current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Нет доступа")
 
-    return db.query(Booking).filter(Booking.guest_id == guest_id).all()
+    result = await db.execute(booking_rows.select().where(Booking.guest_id == guest_id))
+    return booking_rows.response(result.all())
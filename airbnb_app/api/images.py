@@ -1,63 +1,136 @@
-from airbnb_app.db.database import SessionLocal
-from airbnb_app.db.models import PropertyImages
-from airbnb_app.db.schema import PropertyImagesSchema
-from sqlalchemy.orm import Session
-from fastapi import HTTPException, Depends, APIRouter
-from typing import List
+from airbnb_app.db.database import get_db, get_read_db
+from airbnb_app.db.models import PropertyImages, Property, UserProfile
+from airbnb_app.db.schema import PropertyImagesSchema, PropertyImagesCreateSchema
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert
+from sqlalchemy.exc import IntegrityError
+from fastapi import HTTPException, Depends, APIRouter, Body, Request
+from typing import List, Optional
+from airbnb_app.api.auth import get_current_user
+from airbnb_app.cinfig import BULK_MAX_ITEMS
+from airbnb_app.services import media
+from airbnb_app.services.bulk import insert_items
+from airbnb_app.services.export import export_format, stream_export
+from airbnb_app.services.serialization import RowEncoder
 
 image_router = APIRouter(prefix='/images', tags=['Property Images'])
+image_rows = RowEncoder(PropertyImages, PropertyImagesSchema)
 
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 
 @image_router.post('/create/', response_model=PropertyImagesSchema)
-async def create_image(image: PropertyImagesSchema, db: Session = Depends(get_db)):
-    image_db = PropertyImages(**image.dict())
+async def create_image(image: PropertyImagesSchema, db: AsyncSession = Depends(get_db)):
+    image_db = PropertyImages(**image.dict(exclude={'variants'}))
     db.add(image_db)
-    db.commit()
-    db.refresh(image_db)
+    await db.commit()
+    await db.refresh(image_db)
+    return image_db
+
+
+@image_router.post('/create/bulk/', response_model=List[PropertyImagesSchema])
+async def create_images(images: List[PropertyImagesCreateSchema] = Body(..., min_length=1, max_length=BULK_MAX_ITEMS),
+                        db: AsyncSession = Depends(get_db),
+                        current_user: UserProfile = Depends(get_current_user)):
+    property_ids = {image.property_id for image in images}
+    owners = dict((await db.execute(select(Property.id, Property.owner_id)
+                                    .where(Property.id.in_(property_ids)))).all())
+
+    errors = []
+    for index, image in enumerate(images):
+        if image.property_id not in owners:
+            errors.append({'index': index, 'detail': 'Property не найден'})
+        elif owners[image.property_id] != current_user.id and current_user.role != 'admin':
+            errors.append({'index': index, 'detail': 'Нет доступа'})
+    if errors:
+        # всё или ничего: ни одна картинка не сохраняется, пока в пачке есть ошибки
+        raise HTTPException(status_code=422, detail=errors)
+
+    rows = await insert_items(db, insert(PropertyImages).returning(*image_rows.columns,
+                                                                   sort_by_parameter_order=True),
+                              [image.dict() for image in images])
+    await db.commit()
+    return image_rows.response(rows)
+
+
+@image_router.post('/upload/{property_id}/', response_model=PropertyImagesSchema)
+async def upload_image(property_id: int, request: Request, db: AsyncSession = Depends(get_db),
+                       current_user: UserProfile = Depends(get_current_user)):
+    """Тело запроса -- сам файл (Content-Type: image/jpeg, image/png, ...), без multipart."""
+    owner_id = await db.scalar(select(Property.owner_id).where(Property.id == property_id))
+    if owner_id is None:
+        raise HTTPException(status_code=404, detail='Property не найден')
+    if owner_id != current_user.id and current_user.role != 'admin':
+        raise HTTPException(status_code=403, detail='Нет доступа')
+    await db.rollback()  # не держим соединение, пока идёт загрузка и ресайз
+
+    digest, original, created = await media.store_upload(request.stream(), request.headers.get('content-type'))
+    existing = await db.scalar(select(PropertyImages).where(PropertyImages.property_id == property_id,
+                                                            PropertyImages.content_hash == digest))
+    if existing is not None:
+        return existing
+    await db.rollback()
+
+    try:
+        variants = await media.make_variants(digest, original)
+    except HTTPException:
+        if created:
+            media.discard(original)
+        raise
+
+    image_db = PropertyImages(image_url=media.media_url(original), property_id=property_id,
+                              content_hash=digest, variants=variants)
+    db.add(image_db)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # параллельная загрузка тех же байтов успела первой -- файлы общие, отдаём её строку
+        await db.rollback()
+        existing = await db.scalar(select(PropertyImages).where(PropertyImages.property_id == property_id,
+                                                                PropertyImages.content_hash == digest))
+        if existing is None:
+            raise
+        return existing
     return image_db
 
 
 @image_router.get('/', response_model=List[PropertyImagesSchema])
-async def list_images(db: Session = Depends(get_db)):
-    return db.query(PropertyImages).all()
+async def list_images(db: AsyncSession = Depends(get_read_db),
+                      fmt: Optional[str] = Depends(export_format)):
+    if fmt:
+        return stream_export(select(PropertyImages).order_by(PropertyImages.id),
+                             PropertyImagesSchema, fmt, 'images')
+    result = await db.execute(image_rows.select())
+    return image_rows.response(result.all())
 
 
 @image_router.get('/{image_id}/', response_model=PropertyImagesSchema)
-async def get_image(image_id: int, db: Session = Depends(get_db)):
-    image = db.query(PropertyImages).filter(PropertyImages.id == image_id).first()
+async def get_image(image_id: int, db: AsyncSession = Depends(get_read_db)):
+    image = await db.get(PropertyImages, image_id)
     if not image:
         raise HTTPException(status_code=404, detail="Image не найден")
     return image
 
 
 @image_router.put('/{image_id}/', response_model=PropertyImagesSchema)
-async def update_image(image_id: int, image: PropertyImagesSchema, db: Session = Depends(get_db)):
-    image_db = db.query(PropertyImages).filter(PropertyImages.id == image_id).first()
+async def update_image(image_id: int, image: PropertyImagesSchema, db: AsyncSession = Depends(get_db)):
+    image_db = await db.get(PropertyImages, image_id)
     if image_db is None:
         raise HTTPException(status_code=404, detail='Image не найден')
 
-    for image_key, image_value in image.dict().items():
+    for image_key, image_value in image.dict(exclude={'variants'}).items():
         setattr(image_db, image_key, image_value)
 
-    db.commit()
-    db.refresh(image_db)
+    await db.commit()
+    await db.refresh(image_db)
     return image_db
 
 
 @image_router.delete('/{image_id}/')
-async def delete_image(image_id: int, db: Session = Depends(get_db)):
-    image_db = db.query(PropertyImages).filter(PropertyImages.id == image_id).first()
+async def delete_image(image_id: int, db: AsyncSession = Depends(get_db)):
+    image_db = await db.get(PropertyImages, image_id)
     if image_db is None:
         raise HTTPException(status_code=404, detail='Image не найден')
 
-    db.delete(image_db)
-    db.commit()
+    await db.delete(image_db)
+    await db.commit()
     return {'message': 'Image успешно удален'}
@@ -1,55 +1,98 @@
-from airbnb_app.db.database import SessionLocal
+from airbnb_app.db.database import get_db, get_read_db
 from airbnb_app.db.models import Message, BookingStatusChoices, Booking, UserProfile
 from airbnb_app.db.schema import MessageSchema
-from sqlalchemy.orm import Session
-from fastapi import HTTPException, Depends, APIRouter
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, true
+from sqlalchemy.orm import aliased
+from sqlalchemy.exc import IntegrityError
+from fastapi import HTTPException, Depends, APIRouter, Query, Response
+from typing import List, Optional
 from pydantic import BaseModel
 from airbnb_app.api.auth import get_current_user
+from airbnb_app.services.availability import availability_index
+from airbnb_app.services.search_cache import search_cache
+from airbnb_app.services import occupancy
+from airbnb_app.services.pagination import SortKey, apply_keyset, split_page, NEXT_CURSOR_HEADER
 
 message_router = APIRouter(prefix="/messages", tags=["Messages"])
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+PENDING_COUNT_HEADER = 'X-Pending-Count'
+NEWEST_FIRST = SortKey(Message.id, descending=True)
+
 
 class StatusUpdateSchema(BaseModel):
     new_status: BookingStatusChoices
 
 
 @message_router.get("/host/{host_id}/", response_model=List[MessageSchema])
-async def get_host_messages(host_id: int, db: Session = Depends(get_db)):
-    messages = db.query(Message).join(Message.booking).join(Booking.property)\
-        .filter(Booking.property.has(owner_id=host_id)).all()
+async def get_host_messages(host_id: int, response: Response,
+                            status: Optional[BookingStatusChoices] = None,
+                            limit: int = Query(50, ge=1, le=200), cursor: Optional[str] = None,
+                            db: AsyncSession = Depends(get_read_db)):
+    query = select(Message).where(Message.host_id == host_id)
+    if status is not None:
+        query = query.where(Message.status == status)
+    page = apply_keyset(query, 'newest', NEWEST_FIRST, Message.id, cursor).limit(limit + 1).subquery()
+    pending = (select(func.count().label('pending')).select_from(Message)
+               .where(Message.host_id == host_id, Message.status == BookingStatusChoices.pending)
+               .subquery())
+
+    # count LEFT JOIN page: one round trip, and the count survives an empty page
+    message = aliased(Message, page)
+    rows = (await db.execute(select(pending.c.pending, message).select_from(pending)
+                             .outerjoin(page, true()).order_by(page.c.id.desc()))).all()
+
+    messages, next_cursor = split_page([row[1] for row in rows if row[1] is not None],
+                                       limit, 'newest', NEWEST_FIRST)
+    response.headers[PENDING_COUNT_HEADER] = str(rows[0][0])
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return messages
 
 
 @message_router.post("/{message_id}/approve", response_model=MessageSchema)
 async def approve_booking_request(message_id: int,status_update: StatusUpdateSchema,
-                                  db: Session = Depends(get_db),
+                                  db: AsyncSession = Depends(get_db),
                                   current_user: UserProfile = Depends(get_current_user)):
     new_status = status_update.new_status
 
     if new_status not in [BookingStatusChoices.approved, BookingStatusChoices.rejected]:
         raise HTTPException(status_code=400, detail='Неверный статус')
 
-    message = db.query(Message).filter(Message.id == message_id).first()
-    if not message:
+    row = (await db.execute(select(Message, Booking).join(Message.booking)
+                            .where(Message.id == message_id))).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Message не найден")
+    message, booking = row
 
-    booking = db.query(Booking).filter(Booking.id == message.booking_id).first()
-    if not booking:
-        raise HTTPException(status_code=404, detail="Booking не найден")
-
-    if booking.property.owner_id != current_user.id:
+    if message.host_id != current_user.id:
         raise HTTPException(status_code=403, detail="Вы не владелец этого объекта")
 
+    if new_status == BookingStatusChoices.approved:
+        overlapping = await db.scalar(select(Booking.id).where(
+            Booking.id != booking.id,
+            Booking.property_id == booking.property_id,
+            Booking.status == BookingStatusChoices.approved,
+            Booking.check_out > booking.check_in,
+            Booking.check_in < booking.check_out
+        ).limit(1))
+        if overlapping:
+            raise HTTPException(status_code=409, detail='Этот объект уже забронирован на эту дату')
+
+    was_approved = booking.status == BookingStatusChoices.approved
     message.status = new_status
     booking.status = new_status
 
-    db.commit()
-    db.refresh(message)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # lost a race with a concurrent approval, booking_approved_no_overlap caught it
+        await db.rollback()
+        raise HTTPException(status_code=409, detail='Этот объект уже забронирован на эту дату')
+    await db.refresh(message)
+    availability_index.sync(booking)
+    if was_approved or new_status == BookingStatusChoices.approved:
+        search_cache.invalidate_dates()
+        await occupancy.refresh_occupancy(db, booking.property_id,
+                                          occupancy.stay_years(booking.check_in, booking.check_out))
     return message
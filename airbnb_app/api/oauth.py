@@ -3,8 +3,9 @@ from authlib.integrations.starlette_client import OAuth
 from starlette.config import Config
 from starlette.responses import RedirectResponse
 from airbnb_app.db.models import UserProfile
-from airbnb_app.db.database import SessionLocal
-from sqlalchemy.orm import Session
+from airbnb_app.db.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 
 oauth_router = APIRouter(prefix="/oauth", tags=["OAuth"])
 
@@ -31,12 +32,6 @@ oauth.register(
     client_kwargs={'scope': 'user:email'},
 )
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
 @oauth_router.get("/login/{provider}")
 async def login(provider: str, request: Request):
@@ -44,7 +39,7 @@ async def login(provider: str, request: Request):
     return await oauth.create_client(provider).authorize_redirect(request, redirect_uri)
 
 @oauth_router.get("/auth/{provider}")
-async def auth_callback(provider: str, request: Request, db: Session = Depends(get_db)):
+async def auth_callback(provider: str, request: Request, db: AsyncSession = Depends(get_db)):
     token = await oauth.create_client(provider).authorize_access_token(request)
     user_info = await oauth.create_client(provider).parse_id_token(request, token) if provider == "google" else \
                 await oauth.github.get('user', token=token)
@@ -54,12 +49,12 @@ async def auth_callback(provider: str, request: Request, db: Session = Depends(g
     if not email:
         raise Exception("Email not found")
 
-    user = db.query(UserProfile).filter(UserProfile.email == email).first()
+    user = await db.scalar(select(UserProfile).where(UserProfile.email == email))
     if not user:
         user = UserProfile(username=email.split('@')[0], email=email, role="guest", is_active=True)
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
 
     return {"access_token": "JWT для пользователя", "token_type": "bearer"}
 
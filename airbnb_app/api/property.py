@@ -1,111 +1,275 @@
-from airbnb_app.db.database import SessionLocal
-from airbnb_app.db.models import Property, UserProfile
-from airbnb_app.db.schema import PropertySchema, PropertyCreateSchema
-from sqlalchemy.orm import Session
-from fastapi import HTTPException, Depends, APIRouter
-from typing import List
+from airbnb_app.db.database import get_db, get_read_db
+from airbnb_app.db.models import Property, UserProfile, PropertyImages, Review
+from airbnb_app.db.schema import (PropertySchema, PropertyCreateSchema, AvailabilitySchema,
+                                  PropertyDetailSchema, OccupancySchema)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, func
+from sqlalchemy.orm import selectinload, joinedload
+from fastapi import HTTPException, Depends, APIRouter, Query, Body, Header, Response
+from typing import List, Optional, Tuple
+from datetime import date, datetime, time
 from airbnb_app.api.auth import get_current_user
 from airbnb_app.admin.admin import admin_router, admin_only  # Не забудь подключить
+from airbnb_app.services.availability import availability_index
+from airbnb_app.services import occupancy
+from airbnb_app.services.pagination import SortKey, apply_keyset, split_page, NEXT_CURSOR_HEADER
+from airbnb_app.services.search_cache import (search_cache, cache_key, property_state, property_rows,
+                                              page_etag, revalidate)
+from airbnb_app.services.export import export_format, stream_export
+from airbnb_app.services.bulk import insert_items
+from airbnb_app.cinfig import BULK_MAX_ITEMS
+from airbnb_app.services.conditional import make_etag, etag_matches, validators, not_modified
 
 property_router = APIRouter(prefix='/property', tags=['Property'])
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+BY_ID = SortKey(Property.id)
+
+# ?include= -> how to load it: owner joins into the property query,
+# collections get one SELECT ... WHERE property_id IN (...) each
+INCLUDES = {
+    'owner': joinedload(Property.owner),
+    'images': selectinload(Property.images),
+    'reviews': selectinload(Property.reviews),
+}
+INCLUDED_COLLECTIONS = {'images': PropertyImages, 'reviews': Review}
+
+
+def detail_version(property_id: int, includes: set):
+    """One-row probe of everything the detail response depends on: timestamps, counts and owner fields."""
+    columns = [Property.updated_at]
+    for name in sorted(includes & INCLUDED_COLLECTIONS.keys()):
+        model = INCLUDED_COLLECTIONS[name]
+        # count catches deletions, max(updated_at) catches inserts and edits
+        columns.append(select(func.max(model.updated_at)).where(model.property_id == Property.id).scalar_subquery())
+        columns.append(select(func.count(model.id)).where(model.property_id == Property.id).scalar_subquery())
+    query = select(*columns).where(Property.id == property_id)
+    if 'owner' in includes:
+        query = query.join(Property.owner).add_columns(UserProfile.username, UserProfile.role, UserProfile.avatar)
+    return query
+
 
 @property_router.post('/create/', response_model=PropertySchema)
-async def create_property(prop_data: PropertyCreateSchema, db: Session = Depends(get_db),
+async def create_property(prop_data: PropertyCreateSchema, db: AsyncSession = Depends(get_db),
                           current_user: UserProfile = Depends(get_current_user)):
     if current_user.role != 'host':
         raise HTTPException(status_code=403, detail="Only hosts can create properties")
 
-    property_db = Property(**prop_data.dict(), owner_id=current_user.id)
+    property_db = Property(**prop_data.dict(exclude={'owner_id'}), owner_id=current_user.id)
     db.add(property_db)
-    db.commit()
-    db.refresh(property_db)
+    await db.commit()
+    await db.refresh(property_db)
+    search_cache.invalidate_property(property_db.id, after=property_state(property_db))
     return property_db
 
+
+@property_router.post('/create/bulk/', response_model=List[PropertySchema])
+async def create_properties(props: List[PropertyCreateSchema] = Body(..., min_length=1, max_length=BULK_MAX_ITEMS),
+                            db: AsyncSession = Depends(get_db),
+                            current_user: UserProfile = Depends(get_current_user)):
+    # pydantic уже проверил все элементы вместе: ошибки приходят в 422 с индексом элемента
+    if current_user.role != 'host':
+        raise HTTPException(status_code=403, detail="Only hosts can create properties")
+
+    values = [dict(prop.dict(exclude={'owner_id'}), owner_id=current_user.id) for prop in props]
+    # один multi-row INSERT ... RETURNING, строки в порядке запроса
+    rows = await insert_items(db, insert(Property).returning(*property_rows.columns, Property.is_approved,
+                                                             sort_by_parameter_order=True), values)
+    await db.commit()
+    for row in rows:
+        search_cache.invalidate_property(row.id, after=property_state(row))
+    return property_rows.response(rows)
+
 @property_router.get('/', response_model=List[PropertySchema])
-async def list_property(db: Session = Depends(get_db)):
-    return db.query(Property).filter(Property.is_approved == True).all()
+async def list_property(db: AsyncSession = Depends(get_read_db),
+                        limit: int = Query(100, ge=1, le=500), cursor: Optional[str] = None,
+                        fmt: Optional[str] = Depends(export_format),
+                        if_none_match: Optional[str] = Header(None)):
+    if fmt:
+        # exports skip the page cache and pagination: every approved property, by id
+        return stream_export(select(Property).where(Property.is_approved == True).order_by(Property.id),
+                             PropertySchema, fmt, 'properties')
+    key = cache_key('list', limit=limit, cursor=cursor)
+    cached = search_cache.get(key)
+    if cached is not None:
+        return cached.response(if_none_match)
 
-@property_router.get('/{property_id}/', response_model=PropertySchema)
-async def detail_property(property_id: int, db: Session = Depends(get_db)):
-    prop = db.query(Property).filter(Property.id == property_id).first()
+    query = apply_keyset(property_rows.select(Property.updated_at).where(Property.is_approved == True),
+                         'id', BY_ID, Property.id, cursor).limit(limit + 1)
+    unchanged = await revalidate(db, key, query, if_none_match)
+    if unchanged is not None:
+        return unchanged
+    rows = (await db.execute(query)).all()
+    etag = page_etag(key, rows)
+    rows, next_cursor = split_page(rows, limit, 'id', BY_ID)
+    return search_cache.store(key, rows, next_cursor, lambda state: state['is_approved'],
+                              if_none_match=if_none_match, etag=etag)
+
+@property_router.get('/{property_id}/', response_model=PropertyDetailSchema, response_model_exclude_unset=True)
+async def detail_property(property_id: int, response: Response, db: AsyncSession = Depends(get_read_db),
+                          include: Optional[str] = Query(None, description='images,reviews,owner'),
+                          if_none_match: Optional[str] = Header(None)):
+    includes = {name.strip() for name in include.split(',') if name.strip()} if include else set()
+    unknown = includes - INCLUDES.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Неизвестный include: {', '.join(sorted(unknown))}")
+
+    # дешёвая проверка версии по индексам; 304 без загрузки самих строк
+    version = (await db.execute(detail_version(property_id, includes))).first()
+    if version is None:
+        raise HTTPException(status_code=404, detail='Property не найден')
+    headers = validators(make_etag(property_id, sorted(includes), tuple(version)),
+                         max(value for value in version if isinstance(value, datetime)))
+    if etag_matches(if_none_match, headers['ETag']):
+        return not_modified(headers)
+    response.headers.update(headers)
+
+    # не больше 1 + len(includes) запросов: owner -- JOIN, images/reviews -- selectin
+    prop = await db.get(Property, property_id, options=[INCLUDES[name] for name in includes])
     if not prop:
         raise HTTPException(status_code=404, detail='Property не найден')
-    return prop
+
+    # только явно переданные поля попадают в ответ (exclude_unset): без include -- прежний PropertySchema
+    data = PropertySchema.model_validate(prop).model_dump()
+    for name in includes:
+        data[name] = getattr(prop, name)
+    return PropertyDetailSchema.model_validate(data)
+
+async def calendar_window(property_id: int, start: date, end: date,
+                          db: AsyncSession = Depends(get_read_db)) -> Tuple[date, date]:
+    """[start, end) of /availability/ and /occupancy/: at most 366 days of an existing property."""
+    if end <= start:
+        raise HTTPException(status_code=400, detail='end должен быть позже start')
+    if (end - start).days > 366:
+        raise HTTPException(status_code=400, detail='Максимум 366 дней')
+
+    exists = await db.scalar(select(Property.id).where(Property.id == property_id))
+    if not exists:
+        raise HTTPException(status_code=404, detail='Property не найден')
+    return start, end
+
+@property_router.get('/{property_id}/availability/', response_model=AvailabilitySchema)
+async def property_availability(property_id: int, window: Tuple[date, date] = Depends(calendar_window),
+                                db: AsyncSession = Depends(get_read_db)):
+    start, end = window
+    window_start = datetime.combine(start, time.min)
+    window_end = datetime.combine(end, time.min)
+    booked, free = [], []
+    cursor = window_start
+    for check_in, check_out, _ in await availability_index.read_booked(db, property_id,
+                                                                       window_start, window_end):
+        booked.append({'check_in': check_in, 'check_out': check_out})
+        if check_in > cursor:
+            free.append({'check_in': cursor, 'check_out': check_in})
+        cursor = max(cursor, check_out)
+    if cursor < window_end:
+        free.append({'check_in': cursor, 'check_out': window_end})
+
+    return {'property_id': property_id, 'start': start, 'end': end, 'booked': booked, 'free': free}
+
+@property_router.get('/{property_id}/occupancy/', response_model=OccupancySchema)
+async def property_occupancy(property_id: int, window: Tuple[date, date] = Depends(calendar_window),
+                             nights: Optional[int] = Query(None, ge=1),
+                             db: AsyncSession = Depends(get_read_db)):
+    # календарь месяца: start=2026-11-01&end=2026-12-01; окна под N ночей: &nights=N
+    start, end = window
+    mask, length = await occupancy.load_window(db, property_id, start, end)
+    booked_nights = occupancy.booked_nights(mask)
+    return {
+        'property_id': property_id, 'start': start, 'end': end,
+        'booked_nights': booked_nights,
+        'occupancy_rate': round(booked_nights / length, 4),
+        'booked': occupancy.days(mask, start),
+        'free_starts': occupancy.days(occupancy.free_starts(mask, length, nights), start) if nights else [],
+    }
 
 @property_router.put('/{property_id}/', response_model=PropertySchema)
 async def update_property(property_id: int, prop_data: PropertyCreateSchema,
-                          db: Session = Depends(get_db),
+                          db: AsyncSession = Depends(get_db),
                           current_user: UserProfile = Depends(get_current_user)):
-    property_db = db.query(Property).filter(Property.id == property_id).first()
-
-    if property_db.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Нет доступа к этому объекту")
-
+    property_db = await db.get(Property, property_id)
     if property_db is None:
         raise HTTPException(status_code=404, detail='Property не найден')
 
     if property_db.owner_id != current_user.id and current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Нет доступа")
 
-    for key, value in prop_data.dict().items():
+    before = property_state(property_db)
+    # ownership is not transferable here; message.host_id relies on it
+    for key, value in prop_data.dict(exclude={'owner_id'}).items():
         setattr(property_db, key, value)
 
     db.add(property_db)
-    db.commit()
-    db.refresh(property_db)
+    await db.commit()
+    await db.refresh(property_db)
+    search_cache.invalidate_property(property_id, before, property_state(property_db))
     return property_db
 
 
 
 @property_router.delete('/{property_id}/')
-async def delete_property(property_id: int, db: Session = Depends(get_db),
+async def delete_property(property_id: int, db: AsyncSession = Depends(get_db),
                           current_user: UserProfile = Depends(get_current_user)):
-    property_db = db.query(Property).filter(Property.id == property_id).first()
+    property_db = await db.get(Property, property_id)
     if property_db is None:
         raise HTTPException(status_code=404, detail='Property не найден')
 
     if property_db.owner_id != current_user.id and current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Нет доступа")
 
-    db.delete(property_db)
-    db.commit()
+    before = property_state(property_db)
+    await db.delete(property_db)
+    await db.commit()
+    search_cache.invalidate_property(property_id, before)
     return {'message': 'ресурс успешно удален'}
 
 @property_router.get('/owner/{owner_id}/', response_model=List[PropertySchema])
-async def list_properties_by_owner(owner_id: int, db: Session = Depends(get_db)):
-    return db.query(Property).filter(Property.owner_id == owner_id).all()
+async def list_properties_by_owner(owner_id: int,
+                                   db: AsyncSession = Depends(get_read_db),
+                                   limit: int = Query(100, ge=1, le=500),
+                                   cursor: Optional[str] = None,
+                                   if_none_match: Optional[str] = Header(None)):
+    last_modified, count = (await db.execute(select(func.max(Property.updated_at), func.count(Property.id))
+                                             .where(Property.owner_id == owner_id))).one()
+    headers = validators(make_etag(owner_id, limit, cursor, last_modified, count), last_modified)
+    if etag_matches(if_none_match, headers['ETag']):
+        return not_modified(headers)
+
+    query = apply_keyset(property_rows.select().where(Property.owner_id == owner_id), 'id', BY_ID,
+                         Property.id, cursor)
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    rows, next_cursor = split_page(rows, limit, 'id', BY_ID)
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    return property_rows.response(rows, headers)
 
 
 
 @admin_router.get("/properties/pending", response_model=List[PropertySchema])
-async def list_pending_properties(db: Session = Depends(get_db),
+async def list_pending_properties(db: AsyncSession = Depends(get_db),
                                   current_user: UserProfile = Depends(admin_only)):
-    pending = db.query(Property).filter(Property.is_approved == False).all()
-    return pending
+    pending = await db.scalars(select(Property).where(Property.is_approved == False))
+    return pending.all()
 
 @admin_router.put("/property/{property_id}/approve")
-async def approve_property(property_id: int, db: Session = Depends(get_db),
+async def approve_property(property_id: int, db: AsyncSession = Depends(get_db),
                            current_user: UserProfile = Depends(admin_only)):
-    prop = db.query(Property).filter(Property.id == property_id).first()
+    prop = await db.get(Property, property_id)
     if not prop:
         raise HTTPException(status_code=404, detail="Property not found")
+    before = property_state(prop)
     prop.is_approved = True
-    db.commit()
+    await db.commit()
+    search_cache.invalidate_property(prop.id, before, property_state(prop))
     return {"message": f"Property {prop.id} одобрен"}
 
 @admin_router.put("/property/{property_id}/reject")
-async def reject_property(property_id: int, db: Session = Depends(get_db),
+async def reject_property(property_id: int, db: AsyncSession = Depends(get_db),
                           current_user: UserProfile = Depends(admin_only)):
-    prop = db.query(Property).filter(Property.id == property_id).first()
+    prop = await db.get(Property, property_id)
     if not prop:
         raise HTTPException(status_code=404, detail="Property not found")
-    db.delete(prop)
-    db.commit()
+    before = property_state(prop)
+    await db.delete(prop)
+    await db.commit()
+    search_cache.invalidate_property(property_id, before)
     return {"message": f"Property {property_id} отклонён и удалён"}
\ No newline at end of file
@@ -1,53 +1,164 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query, HTTPException, Header
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, exists
 from typing import List, Optional
-from airbnb_app.db.database import SessionLocal
-from airbnb_app.db.models import Property
+from datetime import datetime
+from airbnb_app.db.database import get_read_db
+from airbnb_app.db.models import Property, Booking, BookingStatusChoices, property_search_vector
 from airbnb_app.db.schema import PropertySchema
+from airbnb_app.services.pagination import SortKey, apply_keyset, split_page
+from airbnb_app.services.search_cache import search_cache, cache_key, property_rows, page_etag, revalidate
+from airbnb_app.services import geo
+from airbnb_app.cinfig import GEO_DEFAULT_RADIUS_KM, GEO_MAX_RADIUS_KM
 
 pagination_router = APIRouter(prefix='/property', tags=['PropertyAdvanced'])
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+SORTS = {
+    'id': SortKey(Property.id),
+    'price_asc': SortKey(Property.price_per_night),
+    'price_desc': SortKey(Property.price_per_night, descending=True),
+    'date_desc': SortKey(Property.created_at, descending=True, parse=datetime.fromisoformat),
+    'rating_desc': SortKey(Property.rating_avg, descending=True),
+}
+
 
 @pagination_router.get('/search/', response_model=List[PropertySchema])
 async def search_properties(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
+    q: Optional[str] = Query(None, max_length=200),  # поиск по title/description/city/address
     city: Optional[str] = None,
     min_price: Optional[int] = Query(None, ge=0),
     max_price: Optional[int] = Query(None, ge=0),
     property_type: Optional[str] = None,
     min_guests: Optional[int] = Query(None, ge=1),  # фильтр по минимум гостей
-    order_by: Optional[str] = None,  # price_asc, price_desc, rating_desc, date_desc
+    min_rating: Optional[float] = Query(None, ge=1, le=5),
+    # рядом со мной: lat/lon + radius_km; видимая область карты: bbox=min_lon,min_lat,max_lon,max_lat
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0, le=GEO_MAX_RADIUS_KM),
+    bbox: Optional[str] = None,
+    # свободен на даты: нет пересекающихся approved бронирований
+    check_in: Optional[datetime] = None,
+    check_out: Optional[datetime] = None,
+    order_by: Optional[str] = None,  # price_asc, price_desc, rating_desc, date_desc, distance
 
     limit: int = Query(10, ge=1, le=100),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),  # устарело, используйте cursor
+    cursor: Optional[str] = None,  # значение из заголовка X-Next-Cursor
+    if_none_match: Optional[str] = Header(None)  # ETag прошлого ответа -> 304 без тела
 ):
-    query = db.query(Property).filter(Property.is_approved == True)  # показываем только одобренные
+    # ilike и 'simple' tsquery не зависят от регистра -- один ключ кэша на вариант написания
+    city = city.strip().lower() or None if city else None
+    q = q.strip().lower() or None if q else None
+
+    if (lat is None) != (lon is None):
+        raise HTTPException(status_code=400, detail='lat и lon передаются вместе')
+    if lat is not None and radius_km is None:
+        radius_km = GEO_DEFAULT_RADIUS_KM
+    box = None
+    if bbox:
+        try:
+            min_lon, min_lat, max_lon, max_lat = (float(part) for part in bbox.split(','))
+        except ValueError:
+            raise HTTPException(status_code=400, detail='bbox: min_lon,min_lat,max_lon,max_lat')
+        if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= max_lon <= 180):
+            raise HTTPException(status_code=400, detail='bbox вне допустимых координат')
+        box = geo.BBox(min_lat, min_lon, max_lat, max_lon)
+    if (check_in is None) != (check_out is None):
+        raise HTTPException(status_code=400, detail='check_in и check_out передаются вместе')
+    if check_in is not None and check_out <= check_in:
+        raise HTTPException(status_code=400, detail='check_out должен быть позже check_in')
+    if order_by == 'distance' and lat is None:
+        raise HTTPException(status_code=400, detail='order_by=distance требует lat и lon')
+
+    sorts = dict(SORTS)
+    if lat is not None:
+        sorts['distance'] = SortKey(geo.distance_km(lat, lon).label('distance'), parse=float)
+    if order_by in sorts:
+        sort_name = order_by
+    elif lat is not None:
+        sort_name = 'distance'
+    elif q:
+        sort_name = 'relevance'
+    else:
+        sort_name = 'id'
+    key = cache_key('search', q=q, city=city, min_price=min_price, max_price=max_price,
+                    property_type=property_type, min_guests=min_guests, min_rating=min_rating,
+                    lat=lat, lon=lon, radius_km=radius_km, bbox=box, check_in=check_in, check_out=check_out,
+                    order_by=sort_name, limit=limit, offset=offset or None, cursor=cursor)
+    cached = search_cache.get(key)
+    if cached is not None:
+        return cached.response(if_none_match)
+
+    sort = sorts.get(sort_name)
+    # строки-кортежи только с нужными колонками (+ ключ сортировки для cursor)
+    query = property_rows.select(Property.updated_at, *([sort.column] if sort else []))
+    query = query.where(Property.is_approved == True)  # показываем только одобренные
 
     if city:
-        query = query.filter(Property.city.ilike(f"%{city}%"))
-    if not min_price:
-        query = query.filter(Property.price_per_night >= min_price)
-    if not max_price:
-        query = query.filter(Property.price_per_night <= max_price)
+        query = query.where(Property.city.ilike(f"%{city}%"))
+    if min_price is not None:
+        query = query.where(Property.price_per_night >= min_price)
+    if max_price is not None:
+        query = query.where(Property.price_per_night <= max_price)
     if property_type:
-        query = query.filter(Property.property_type == property_type)
-    if not min_guests:
-        query = query.filter(Property.max_guests >= min_guests)
-
-    if order_by == "price_asc":
-        query = query.order_by(Property.price_per_night.asc())
-    elif order_by == "price_desc":
-        query = query.order_by(Property.price_per_night.desc())
-    elif order_by == "rating_desc":
-        query = query.order_by(Property.rating.desc())
-    elif order_by == "date_desc":
-        query = query.order_by(Property.created_at.desc())
-
-    properties = query.offset(offset).limit(limit).all()
-    return properties
+        query = query.where(Property.property_type == property_type)
+    if min_guests is not None:
+        query = query.where(Property.max_guests >= min_guests)
+    if min_rating is not None:
+        query = query.where(Property.rating_avg >= min_rating)
+    if q:
+        ts_query = func.websearch_to_tsquery('simple', q)
+        query = query.where(property_search_vector.op('@@')(ts_query))
+    if box is not None:
+        query = query.where(geo.within(box))
+    if lat is not None:
+        # сначала квадрат вокруг точки по сетке geo_cell, потом точное расстояние
+        query = query.where(geo.within(geo.around(lat, lon, radius_km)),
+                            geo.distance_km(lat, lon) <= radius_km)
+    if check_in is not None:
+        # anti-join в том же запросе, проба по ix_booking_approved_property_check_out
+        query = query.where(~exists(select(Booking.id).where(
+            Booking.property_id == Property.id,
+            Booking.status == BookingStatusChoices.approved,
+            Booking.check_out > check_in,
+            Booking.check_in < check_out
+        )))
+
+    def matches(state: dict) -> bool:
+        """Python twin of the WHERE clause above, used to invalidate cached pages (q and dates are not re-checked)."""
+        return (state['is_approved']
+                and (not city or '%' in city or '_' in city or city.lower() in state['city'].lower())
+                and (min_price is None or state['price_per_night'] >= min_price)
+                and (max_price is None or state['price_per_night'] <= max_price)
+                and (not property_type or state['property_type'] == property_type)
+                and (min_guests is None or state['max_guests'] >= min_guests)
+                and (min_rating is None or (state['rating_avg'] or 0) >= min_rating)
+                and (box is None or box.contains(state['latitude'], state['longitude']))
+                and (lat is None or (state['latitude'] is not None and state['longitude'] is not None
+                                     and geo.haversine_km(lat, lon, state['latitude'], state['longitude'])
+                                     <= radius_km)))
+
+    uses_rating = sort_name == 'rating_desc' or min_rating is not None
+    uses_dates = check_in is not None
+
+    if sort_name == 'relevance':
+        # сортировка по релевантности, у ранга нет стабильного cursor -- только offset
+        query = (query.order_by(func.ts_rank(property_search_vector, ts_query).desc(), Property.id)
+                 .offset(offset).limit(limit))
+    else:
+        query = apply_keyset(query, sort_name, sort, Property.id, cursor)
+        if offset and not cursor:
+            query = query.offset(offset)
+        query = query.limit(limit + 1)
+
+    # промах кэша с If-None-Match: версия страницы одним агрегатом, без загрузки строк
+    unchanged = await revalidate(db, key, query, if_none_match)
+    if unchanged is not None:
+        return unchanged
+    rows = (await db.execute(query)).all()
+    etag = page_etag(key, rows)
+    next_cursor = None
+    if sort_name != 'relevance':
+        rows, next_cursor = split_page(rows, limit, sort_name, sort)
+    return search_cache.store(key, rows, next_cursor, matches, uses_rating, if_none_match, uses_dates, etag)
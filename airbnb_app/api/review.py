@@ -1,34 +1,33 @@
-from airbnb_app.db.database import SessionLocal
+from airbnb_app.db.database import get_db, get_read_db
 from airbnb_app.db.models import Review, Booking
 from airbnb_app.db.schema import ReviewSchema, ReviewCreateSchema
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from fastapi import HTTPException, Depends, APIRouter
-from typing import List
+from typing import List, Optional
 from datetime import datetime
+from airbnb_app.services.ratings import apply_rating_change
+from airbnb_app.services.search_cache import search_cache
+from airbnb_app.services.export import export_format, stream_export
+from airbnb_app.services.serialization import RowEncoder
 
 
 review_router = APIRouter(prefix="/review", tags=["Review"])
+review_rows = RowEncoder(Review, ReviewSchema)
 
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 
 @review_router.post('/create/', response_model=ReviewSchema)
-async def create_review(review_data: ReviewCreateSchema, db: Session = Depends(get_db)):
-    existing = db.query(Review).filter(Review.property_id == review_data.property_id,
-                                       Review.guest_id == review_data.guest_id).first()
+async def create_review(review_data: ReviewCreateSchema, db: AsyncSession = Depends(get_db)):
+    existing = await db.scalar(select(Review.id).where(Review.property_id == review_data.property_id,
+                                                       Review.guest_id == review_data.guest_id).limit(1))
     if existing:
         raise HTTPException(status_code=400, detail='Вы уже оставили отзыв об этом объекте недвижимости')
 
-    booking = db.query(Booking).filter(Booking.property_id == review_data.property_id,
-                                       Booking.guest_id == review_data.guest_id,
-                                       Booking.status == 'approved',
-                                       Booking.check_out < datetime.utcnow()).first()
+    booking = await db.scalar(select(Booking.id).where(Booking.property_id == review_data.property_id,
+                                                       Booking.guest_id == review_data.guest_id,
+                                                       Booking.status == 'approved',
+                                                       Booking.check_out < datetime.utcnow()).limit(1))
 
     if not booking:
         raise HTTPException(status_code=403,
@@ -36,19 +35,25 @@ async def create_review(review_data: ReviewCreateSchema, db: Session = Depends(g
 
     new_review = Review(**review_data.dict())
     db.add(new_review)
-    db.commit()
-    db.refresh(new_review)
+    await apply_rating_change(db, new_review.property_id, added=new_review.rating)
+    await db.commit()
+    search_cache.invalidate_property(new_review.property_id, rating=True)
+    await db.refresh(new_review)
     return new_review
 
 
 @review_router.get('/', response_model=List[ReviewSchema])
-async def list_reviews(db: Session = Depends(get_db)):
-    return db.query(Review).all()
+async def list_reviews(db: AsyncSession = Depends(get_read_db),
+                       fmt: Optional[str] = Depends(export_format)):
+    if fmt:
+        return stream_export(select(Review).order_by(Review.id), ReviewSchema, fmt, 'reviews')
+    result = await db.execute(review_rows.select())
+    return review_rows.response(result.all())
 
 
 @review_router.get('/{review_id}/', response_model=ReviewSchema)
-async def get_review(review_id: int, db: Session = Depends(get_db)):
-    review = db.query(Review).filter(Review.id == review_id).first()
+async def get_review(review_id: int, db: AsyncSession = Depends(get_read_db)):
+    review = await db.get(Review, review_id)
     if not review:
         raise HTTPException(status_code=404, detail='Review не найден')
     return review
@@ -56,30 +61,41 @@ async def get_review(review_id: int, db: Session = Depends(get_db)):
 
 @review_router.put('/{review_id}/', response_model=ReviewSchema)
 async def update_review(review_id: int, review_data: ReviewCreateSchema,
-                        db: Session = Depends(get_db)):
-    review = db.query(Review).filter(Review.id == review_id).first()
+                        db: AsyncSession = Depends(get_db)):
+    review = await db.get(Review, review_id)
     if not review:
         raise HTTPException(status_code=404, detail='Review не найден')
 
-    for review, review_key, review_value in review_data.dict().items():
+    old_property_id, old_rating = review.property_id, review.rating
+    for review_key, review_value in review_data.dict().items():
         setattr(review, review_key, review_value)
 
-    db.commit()
-    db.refresh(review)
+    if review.property_id != old_property_id:
+        await apply_rating_change(db, old_property_id, removed=old_rating)
+        await apply_rating_change(db, review.property_id, added=review.rating)
+    else:
+        await apply_rating_change(db, review.property_id, added=review.rating, removed=old_rating)
+    await db.commit()
+    search_cache.invalidate_property(old_property_id, rating=True)
+    search_cache.invalidate_property(review.property_id, rating=True)
+    await db.refresh(review)
     return review
 
 
 @review_router.delete('/{review_id}/')
-async def delete_review(review_id: int, db: Session = Depends(get_db)):
-    review = db.query(Review).filter(Review.id == review_id).first()
+async def delete_review(review_id: int, db: AsyncSession = Depends(get_db)):
+    review = await db.get(Review, review_id)
     if not review:
         raise HTTPException(status_code=404, detail='Review не найден')
 
-    db.delete(review)
-    db.commit()
+    await db.delete(review)
+    await apply_rating_change(db, review.property_id, removed=review.rating)
+    await db.commit()
+    search_cache.invalidate_property(review.property_id, rating=True)
     return {'message': 'Отзыв успешно удален'}
 
 
 @review_router.get('/property/{property_id}/', response_model=List[ReviewSchema])
-async def list_reviews_by_property(property_id: int, db: Session = Depends(get_db)):
-    return db.query(Review).filter(Review.property_id == property_id).all()
+async def list_reviews_by_property(property_id: int, db: AsyncSession = Depends(get_read_db)):
+    result = await db.execute(review_rows.select().where(Review.property_id == property_id))
+    return review_rows.response(result.all())
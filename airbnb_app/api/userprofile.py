@@ -1,48 +1,51 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from airbnb_app.db.database import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from airbnb_app.db.database import get_db
 from airbnb_app.db.models import UserProfile
 from airbnb_app.db.schema import UserProfileSchema, UserProfileUpdateSchema
 from airbnb_app.api.auth import register, get_password_hash, verify_password
+from airbnb_app.services.principals import principal_cache
 
 
 user_router = APIRouter(prefix="/users", tags=["User Profile"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 
 @user_router.post("/create", response_model=dict)
-async def create_user(user: UserProfileSchema, db: Session = Depends(get_db)):
+async def create_user(user: UserProfileSchema, db: AsyncSession = Depends(get_db)):
     return await register(user, db)
 
 
 @user_router.put('/update/', response_model=dict)
-async def update_user(update_data: UserProfileUpdateSchema, db: Session = Depends(get_db)):
-    user_db = db.query(UserProfile).filter(UserProfile.username == update_data.username).first()
-    if not user_db or not verify_password(update_data.password, user_db.password):
+async def update_user(update_data: UserProfileUpdateSchema, db: AsyncSession = Depends(get_db)):
+    user_db = await db.scalar(select(UserProfile).where(UserProfile.username == update_data.username))
+    if not user_db:
+        raise HTTPException(status_code=403, detail="Неправильный username или password")
+    valid, new_hash = await verify_password(update_data.password, user_db.password)
+    if not valid:
         raise HTTPException(status_code=403, detail="Неправильный username или password")
 
-    for user_key, user_value in update_data.dict().items():
+    # password here is the current one used to authorize the change, never stored as-is
+    for user_key, user_value in update_data.dict(exclude={'password'}).items():
         setattr(user_db, user_key, user_value)
+    if new_hash:
+        user_db.password = new_hash
 
-    db.commit()
-    db.refresh(user_db)
+    await db.commit()
+    await db.refresh(user_db)
+    principal_cache.invalidate(user_id=user_db.id)
     return {"message": "Profile обновлен"}
 
 
 @user_router.delete('/delete/{username}/', response_model=dict)
-async def delete_user(username: str, db: Session = Depends(get_db)):
-    user = db.query(UserProfile).filter(UserProfile.username == username).first()
+async def delete_user(username: str, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(UserProfile).where(UserProfile.username == username))
     if not user:
         raise HTTPException(status_code=404, detail="User не найден")
 
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
+    principal_cache.invalidate(user_id=user.id)
     return {"message": "User удален"}
 
@@ -0,0 +1,36 @@
+"""Fail if the migrated database and db/models.py disagree on indexes.
+
+Run after ``alembic upgrade head``:  python -m airbnb_app.db.check_indexes
+"""
+import sys
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from .database import engine
+from .models import Base
+
+
+INDEX_OPS = ('add_index', 'remove_index')
+
+
+def index_drift(connection) -> list:
+    context = MigrationContext.configure(connection)
+    drift = []
+    for diff in compare_metadata(context, Base.metadata):
+        # modified indexes come back as a list of (remove, add) tuples
+        for op in (diff if isinstance(diff, list) else [diff]):
+            if op[0] in INDEX_OPS:
+                index = op[1]
+                drift.append(f'{op[0]} {index.table.name}.{index.name}')
+    return drift
+
+
+def main() -> int:
+    with engine.connect() as connection:
+        drift = index_drift(connection)
+    for line in drift:
+        print(line)
+    return 1 if drift else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
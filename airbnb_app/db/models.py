@@ -1,6 +1,8 @@
 from .database import Base
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, ForeignKey, Enum, DateTime, Text, Boolean
+from sqlalchemy import (String, Integer, ForeignKey, Enum, DateTime, Text, Boolean, Index, text,
+                        func, literal_column, Float, JSON, BigInteger, Computed, LargeBinary)
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
 from datetime import datetime
 from typing import Optional, List
 from enum import Enum as PyEnum
@@ -42,6 +44,7 @@ class UserProfile(Base):
     phone_number: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     avatar: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     create_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True, server_default=text('true'))
 
     properties: Mapped[List['Property']] = relationship('Property', back_populates='owner',
                                                         cascade='all, delete-orphan')
@@ -72,8 +75,16 @@ class RefreshToken(Base):
     user_id: Mapped[int] = mapped_column(ForeignKey('user_profile.id'))
 
     user: Mapped[UserProfile] = relationship('UserProfile', back_populates='user_token')
-    token: Mapped[str] = mapped_column(String, nullable=False)
-    create_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow())
+    # sha256 hex of the JWT, the token itself is never stored
+    token_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    create_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index('ix_refresh_token_token_hash', 'token_hash', unique=True),
+        Index('ix_refresh_token_expires_at', 'expires_at'),
+        Index('ix_refresh_token_user_id', 'user_id', 'id'),
+    )
 
 
 class PropertyImages(Base):
@@ -81,11 +92,35 @@ class PropertyImages(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     image_url: Mapped[str] = mapped_column(String, nullable=False)
+    # set for files uploaded to local storage: sha256 of the original and {width: url} of its WebP variants
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    variants: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow,
+                                                 server_default=text('CURRENT_TIMESTAMP'))
 
     property_id: Mapped[int] = mapped_column(ForeignKey('property.id'))
 
     property_image: Mapped['Property'] = relationship('Property', back_populates='images')
 
+    __table_args__ = (
+        # one row per distinct upload per property; concurrent duplicates fail here, see upload_image
+        Index('ix_property_images_property_hash', 'property_id', 'content_hash', unique=True),
+    )
+
+
+# Geo grid for radius/bbox search: the globe is cut into 1/GEO_CELLS_PER_DEGREE degree
+# cells numbered row-major from (-90, -180). services/geo.py computes the same numbers.
+# The coarse 1 degree level serves boxes too tall for the fine one (big radii, zoomed-out maps).
+GEO_CELLS_PER_DEGREE = 10
+GEO_COARSE_CELLS_PER_DEGREE = 1
+
+
+def geo_cell_sql(cells_per_degree: int) -> str:
+    # CASE keeps floor() away from NULLs: SQLite's floor() is a Python UDF that raises on them
+    return ('CASE WHEN latitude IS NULL OR longitude IS NULL THEN NULL'
+            f' ELSE CAST(floor((latitude + 90) * {cells_per_degree}) AS INTEGER) * {360 * cells_per_degree}'
+            f' + CAST(floor((longitude + 180) * {cells_per_degree}) AS INTEGER) END')
+
 
 class Property(Base):
     __tablename__ = 'property'
@@ -104,6 +139,29 @@ class Property(Base):
     bedrooms: Mapped[int] = mapped_column(Integer)
     bathrooms: Mapped[int] = mapped_column(Integer)
     is_active: Mapped[bool] = mapped_column(Boolean)
+    is_approved: Mapped[bool] = mapped_column(Boolean, default=False, server_default=text('false'))
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow,
+                                                 server_default=text('CURRENT_TIMESTAMP'))
+    # bumped by every UPDATE issued through SQLAlchemy, ORM or Core; feeds ETag/Last-Modified
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow,
+                                                 server_default=text('CURRENT_TIMESTAMP'))
+
+    # maintained by services/ratings.py together with every review write
+    rating_avg: Mapped[float] = mapped_column(Float, default=0, server_default=text('0'))
+    rating_count: Mapped[int] = mapped_column(Integer, default=0, server_default=text('0'))
+    rating_count_1: Mapped[int] = mapped_column(Integer, default=0, server_default=text('0'))
+    rating_count_2: Mapped[int] = mapped_column(Integer, default=0, server_default=text('0'))
+    rating_count_3: Mapped[int] = mapped_column(Integer, default=0, server_default=text('0'))
+    rating_count_4: Mapped[int] = mapped_column(Integer, default=0, server_default=text('0'))
+    rating_count_5: Mapped[int] = mapped_column(Integer, default=0, server_default=text('0'))
+
+    latitude: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    longitude: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    # generated by the database, so Core inserts, ORM writes and raw SQL all keep it in sync
+    geo_cell: Mapped[Optional[int]] = mapped_column(Integer, Computed(geo_cell_sql(GEO_CELLS_PER_DEGREE),
+                                                                      persisted=True))
+    geo_cell_coarse: Mapped[Optional[int]] = mapped_column(Integer, Computed(
+        geo_cell_sql(GEO_COARSE_CELLS_PER_DEGREE), persisted=True))
 
     owner_id: Mapped[int] = mapped_column(ForeignKey('user_profile.id'))
 
@@ -115,6 +173,36 @@ class Property(Base):
     reviews: Mapped[List['Review']] = relationship('Review', back_populates='property',
                                                    cascade='all, delete-orphan')
 
+    __table_args__ = (
+        Index('ix_property_owner_id', 'owner_id'),
+        # search only ever shows approved listings
+        Index('ix_property_approved_price', 'price_per_night', 'id',
+              postgresql_where=text('is_approved')),
+        Index('ix_property_approved_created', 'created_at', 'id',
+              postgresql_where=text('is_approved')),
+        Index('ix_property_approved_rating', 'rating_avg', 'id',
+              postgresql_where=text('is_approved')),
+        # trigram index so city ILIKE '%...%' does not scan the table
+        Index('ix_property_city_trgm', 'city', postgresql_using='gin',
+              postgresql_ops={'city': 'gin_trgm_ops'}, postgresql_where=text('is_approved')),
+        Index('ix_property_approved_geo_cell', 'geo_cell', postgresql_where=text('is_approved')),
+        Index('ix_property_approved_geo_cell_coarse', 'geo_cell_coarse', postgresql_where=text('is_approved')),
+        # boxes spanning more grid rows than services/geo.py enumerates: plain range on the coordinates
+        Index('ix_property_approved_lat_lon', 'latitude', 'longitude', postgresql_where=text('is_approved')),
+    )
+
+
+# Free-text document for search ?q=. Literals are inlined (not bound) so the
+# planner can match queries against the ix_property_search expression index.
+_columns = Property.__table__.c
+_space = literal_column("' '", String)
+property_search_vector = func.to_tsvector(
+    text("'simple'"),
+    _columns.title + _space + _columns.description + _space + _columns.city + _space + _columns.address
+)
+Index('ix_property_search', property_search_vector, postgresql_using='gin',
+      postgresql_where=text('is_approved')).ddl_if(dialect='postgresql')
+
 
 class Booking(Base):
     __tablename__ = 'booking'
@@ -124,6 +212,8 @@ class Booking(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     check_in: Mapped[datetime] = mapped_column(DateTime)
     check_out: Mapped[datetime] = mapped_column(DateTime)
+    # price_per_night * nights, fixed when the booking is written
+    total_price: Mapped[int] = mapped_column(Integer, default=0, server_default=text('0'))
 
     property_id: Mapped[int] = mapped_column(ForeignKey('property.id'))
     guest_id: Mapped[int] = mapped_column(ForeignKey('user_profile.id'))
@@ -133,6 +223,19 @@ class Booking(Base):
     messages: Mapped[List['Message']] = relationship('Message', back_populates='booking',
                                                      cascade='all, delete-orphan')
 
+    __table_args__ = (
+        # overlap probes (approval, search NOT EXISTS): check_out > :check_in skips past stays in the index
+        Index('ix_booking_approved_property_check_out', 'property_id', 'check_out', 'check_in',
+              postgresql_where=text("status = 'approved'")),
+        Index('ix_booking_guest_property', 'guest_id', 'property_id'),
+        # availability index reloads: upcoming approved stays of all properties
+        Index('ix_booking_approved_check_out', 'check_out', postgresql_where=text("status = 'approved'")),
+        # two approved stays of one property can never overlap, even under concurrent approvals
+        ExcludeConstraint(('property_id', '='), (text('tsrange(check_in, check_out)'), '&&'),
+                          name='booking_approved_no_overlap', using='gist',
+                          where=text("status = 'approved'")).ddl_if(dialect='postgresql'),
+    )
+
 
 
 class Review(Base):
@@ -141,6 +244,8 @@ class Review(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     comment: Mapped[str] = mapped_column(String(86))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow,
+                                                 server_default=text('CURRENT_TIMESTAMP'))
     rating: Mapped[int] = mapped_column(Integer)
 
     property_id: Mapped[int] = mapped_column(ForeignKey('property.id'))
@@ -149,6 +254,10 @@ class Review(Base):
     property: Mapped['Property'] = relationship('Property', back_populates='reviews')
     guest: Mapped['UserProfile'] = relationship('UserProfile', back_populates='reviews')
 
+    __table_args__ = (
+        Index('ix_review_property_guest', 'property_id', 'guest_id'),
+    )
+
 
 
 class Message(Base):
@@ -163,3 +272,59 @@ class Message(Base):
 
     booking: Mapped['Booking'] = relationship('Booking', back_populates='messages')
     host: Mapped['UserProfile'] = relationship('UserProfile', back_populates='messages')
+
+    __table_args__ = (
+        Index('ix_message_booking_id', 'booking_id'),
+        # host inbox: keyset pages newest first, with or without a status filter
+        Index('ix_message_host_id', 'host_id', 'id'),
+        Index('ix_message_host_status', 'host_id', 'status', 'id'),
+    )
+
+
+class AdminStats(Base):
+    """Single-row summary behind /admin/stats, rebuilt by services/stats.py."""
+    __tablename__ = 'admin_stats'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    total_users: Mapped[int] = mapped_column(Integer, default=0)
+    active_users: Mapped[int] = mapped_column(Integer, default=0)
+    total_bookings: Mapped[int] = mapped_column(Integer, default=0)
+    active_bookings: Mapped[int] = mapped_column(Integer, default=0)
+    total_revenue: Mapped[int] = mapped_column(BigInteger, default=0)
+    popular_cities: Mapped[list] = mapped_column(JSON, default=list)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class PropertyOccupancy(Base):
+    """Booked nights of one property in one calendar year, kept by services/occupancy.py.
+
+    Bit i of ``nights`` (little-endian) is the night starting on Jan 1 + i days.
+    Derived from approved bookings, so it can always be rebuilt from them.
+    """
+    __tablename__ = 'property_occupancy'
+
+    property_id: Mapped[int] = mapped_column(ForeignKey('property.id', ondelete='CASCADE'), primary_key=True)
+    year: Mapped[int] = mapped_column(Integer, primary_key=True)
+    nights: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+
+class OutboxEvent(Base):
+    """Side effect written in the same transaction as the change that causes it.
+
+    services/outbox.py claims due rows in batches, runs the handler for
+    ``kind`` and deletes the row; failures are retried later with backoff.
+    """
+    __tablename__ = 'outbox_event'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(64))
+    payload: Mapped[dict] = mapped_column(JSON, default=dict)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # not picked up before this moment; pushed forward after each failed attempt
+    available_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, server_default=text('0'))
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    __table_args__ = (
+        Index('ix_outbox_event_available', 'available_at', 'id'),
+    )
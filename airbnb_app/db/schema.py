@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
-from datetime import datetime
+from typing import Optional, List, Dict
+from datetime import datetime, date
 from .models import (RoleChoices, PropertyTypeChoices,
                      RulesChoices, BookingStatusChoices,
                      bcrypt)
@@ -39,11 +39,17 @@ class PropertyImagesSchema(BaseModel):
     id: int
     image_url: str
     property_id: int
+    variants: Optional[Dict[str, str]] = None
 
     class Config:
         from_attributes = True
 
 
+class PropertyImagesCreateSchema(BaseModel):
+    image_url: str
+    property_id: int
+
+
 class PropertySchema(BaseModel):
     id: int
     title: str
@@ -58,6 +64,10 @@ class PropertySchema(BaseModel):
     bathrooms: int
     is_active: bool
     owner_id: int
+    rating_avg: float = 0
+    rating_count: int = 0
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -76,6 +86,8 @@ class PropertyCreateSchema(BaseModel):
     bathrooms: int
     is_active: bool
     owner_id: int
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
 
     class Config:
         from_attributes = True
@@ -87,6 +99,7 @@ class BookingSchema(BaseModel):
     created_at: datetime
     check_in: datetime
     check_out: datetime
+    total_price: int = 0
     property_id: int
     guest_id: int
 
@@ -105,6 +118,30 @@ class BookingCreateSchema(BaseModel):
 
 
 
+class StaySchema(BaseModel):
+    check_in: datetime
+    check_out: datetime
+
+
+class AvailabilitySchema(BaseModel):
+    property_id: int
+    start: date
+    end: date
+    booked: List[StaySchema]
+    free: List[StaySchema]
+
+
+class OccupancySchema(BaseModel):
+    property_id: int
+    start: date
+    end: date
+    booked_nights: int
+    occupancy_rate: float
+    booked: List[date]
+    # first nights of `nights` consecutive free nights, when ?nights= is given
+    free_starts: List[date] = []
+
+
 class ReviewSchema(BaseModel):
     id: int
     comment: str
@@ -132,6 +169,7 @@ class MessageSchema(BaseModel):
     status: BookingStatusChoices
     created_at: datetime
     booking_id: int
+    host_id: int
 
     class Config:
         orm_mode = True
@@ -141,3 +179,20 @@ class StatusUpdateSchema(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class UserPublicSchema(BaseModel):
+    id: int
+    username: str
+    role: RoleChoices
+    avatar: Optional[str]
+
+    class Config:
+        from_attributes = True
+
+
+class PropertyDetailSchema(PropertySchema):
+    # присутствуют только при ?include=...
+    images: Optional[List[PropertyImagesSchema]] = None
+    reviews: Optional[List[ReviewSchema]] = None
+    owner: Optional[UserPublicSchema] = None
@@ -1,12 +1,42 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.staticfiles import StaticFiles
 from airbnb_app.api import (property, auth, review,
                             images, booking, message,
                             userprofile, property_pagination)
 import uvicorn
 from airbnb_app.admin import admin
+from airbnb_app.cinfig import (AVAILABILITY_REFRESH_SECONDS, REFRESH_TOKEN_SWEEP_SECONDS,
+                               ADMIN_STATS_REFRESH_SECONDS, MEDIA_ROOT, MEDIA_URL, OUTBOX_POLL_SECONDS)
+from airbnb_app.db.database import AsyncSessionLocal
+from airbnb_app.services.availability import availability_index, refresh_availability
+from airbnb_app.services.tokens import sweep_refresh_tokens
+from airbnb_app.services.stats import refresh_admin_stats
+from airbnb_app.services.outbox import dispatch_outbox
+from airbnb_app.services import media
 
 
-airbnb_app = FastAPI(title='OnlineStore')
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    media.ensure_dirs()
+    async with AsyncSessionLocal() as db:
+        await availability_index.load(db)
+    tasks = [
+        asyncio.create_task(refresh_availability(AsyncSessionLocal, AVAILABILITY_REFRESH_SECONDS)),
+        asyncio.create_task(sweep_refresh_tokens(AsyncSessionLocal, REFRESH_TOKEN_SWEEP_SECONDS)),
+        asyncio.create_task(refresh_admin_stats(AsyncSessionLocal, ADMIN_STATS_REFRESH_SECONDS)),
+        asyncio.create_task(dispatch_outbox(AsyncSessionLocal, OUTBOX_POLL_SECONDS)),
+    ]
+    yield
+    for task in tasks:
+        task.cancel()
+    media.shutdown()
+
+
+airbnb_app = FastAPI(title='OnlineStore', lifespan=lifespan)
+# /property/search/ must be registered before /property/{property_id}/
+airbnb_app.include_router(property_pagination.pagination_router)
 airbnb_app.include_router(property.property_router)
 airbnb_app.include_router(auth.auth_router)
 airbnb_app.include_router(review.review_router)
@@ -15,7 +45,8 @@ airbnb_app.include_router(booking.booking_router)
 airbnb_app.include_router(message.message_router)
 airbnb_app.include_router(userprofile.user_router)
 airbnb_app.include_router(admin.admin_router)
-airbnb_app.include_router(property_pagination.pagination_router)
+# local image storage; in production the reverse proxy can serve MEDIA_ROOT directly
+airbnb_app.mount(MEDIA_URL, StaticFiles(directory=MEDIA_ROOT, check_dir=False), name='media')
 
 if __name__ == '__main__':
     uvicorn.run(airbnb_app, host='127.0.0.1', port=8000)
@@ -0,0 +1,209 @@
+"""In-memory index of approved bookings, one sorted interval list per property.
+
+Each worker keeps its own copy: it is loaded on startup, updated by the
+booking/message handlers in this process and periodically reloaded so
+approvals made by other workers show up. The database stays the source of
+truth: writes check overlaps with a query and the exclusion constraint,
+the index only answers read-side availability questions. Stays that ended
+before the last load are not read; ``horizon`` is the moment from which on
+the index is complete, earlier windows have to be read from the table.
+"""
+import asyncio
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select
+from airbnb_app.db.models import Booking, BookingStatusChoices
+
+
+class PropertyCalendar:
+    """Approved stays of a single property, sorted by check-in.
+
+    ``_max_end[i]`` is the latest check-out among the first ``i + 1`` stays,
+    so overlap checks stay O(log n) even if overlapping rows slipped in.
+    ``_by_id`` finds a booking's stay, so add/discard bisect to its position
+    and recompute ``_max_end`` only from there on.
+    """
+
+    __slots__ = ('_stays', '_starts', '_max_end', '_by_id')
+
+    def __init__(self):
+        self._stays: List[Tuple[datetime, datetime, int]] = []
+        self._starts: List[datetime] = []
+        self._max_end: List[datetime] = []
+        self._by_id: Dict[int, Tuple[datetime, datetime, int]] = {}
+
+    @classmethod
+    def from_stays(cls, stays: List[Tuple[datetime, datetime, int]]) -> 'PropertyCalendar':
+        calendar = cls()
+        calendar._stays = sorted(stays)
+        calendar._starts = [stay[0] for stay in calendar._stays]
+        calendar._by_id = {stay[2]: stay for stay in calendar._stays}
+        calendar._reindex(0)
+        return calendar
+
+    def __len__(self):
+        return len(self._stays)
+
+    def _reindex(self, start: int):
+        """Recompute ``_max_end`` from position ``start`` on; earlier entries are unaffected."""
+        latest = self._max_end[start - 1] if start else None
+        del self._max_end[start:]
+        for i in range(start, len(self._stays)):
+            check_out = self._stays[i][1]
+            latest = check_out if latest is None or check_out > latest else latest
+            self._max_end.append(latest)
+
+    def _remove(self, stay: Tuple[datetime, datetime, int]) -> int:
+        i = bisect_left(self._stays, stay)
+        del self._stays[i]
+        del self._starts[i]
+        del self._by_id[stay[2]]
+        return i
+
+    def add(self, booking_id: int, check_in: datetime, check_out: datetime):
+        stay = (check_in, check_out, booking_id)
+        old = self._by_id.get(booking_id)
+        if old == stay:
+            return
+        changed = self._remove(old) if old is not None else len(self._stays)
+        i = bisect_left(self._stays, stay)
+        self._stays.insert(i, stay)
+        self._starts.insert(i, check_in)
+        self._by_id[booking_id] = stay
+        self._reindex(min(changed, i))
+
+    def discard(self, booking_id: int) -> bool:
+        stay = self._by_id.get(booking_id)
+        if stay is None:
+            return False
+        self._reindex(self._remove(stay))
+        return True
+
+    def overlaps(self, check_in: datetime, check_out: datetime) -> bool:
+        i = bisect_left(self._starts, check_out)
+        return i > 0 and self._max_end[i - 1] > check_in
+
+    def booked(self, start: datetime, end: datetime) -> List[Tuple[datetime, datetime, int]]:
+        first = bisect_right(self._max_end, start)
+        last = bisect_left(self._starts, end)
+        return [stay for stay in self._stays[first:last] if stay[1] > start]
+
+
+class AvailabilityIndex:
+    def __init__(self):
+        self._calendars: Dict[int, PropertyCalendar] = {}
+        # one list per load() in flight: writes it has to replay over what it read
+        self._journals: List[List[Tuple[int, int, Optional[Tuple[datetime, datetime]]]]] = []
+        self.loaded = False
+        self.horizon: Optional[datetime] = None
+
+    def clear(self):
+        self._calendars.clear()
+        self.loaded = False
+        self.horizon = None
+
+    @staticmethod
+    def _apply(calendars: Dict[int, PropertyCalendar], property_id: int, booking_id: int,
+               stay: Optional[Tuple[datetime, datetime]]):
+        if stay is not None:
+            calendars.setdefault(property_id, PropertyCalendar()).add(booking_id, *stay)
+            return
+        calendar = calendars.get(property_id)
+        if calendar is not None and calendar.discard(booking_id) and not calendar:
+            del calendars[property_id]
+
+    def _write(self, property_id: int, booking_id: int, stay: Optional[Tuple[datetime, datetime]]):
+        self._apply(self._calendars, property_id, booking_id, stay)
+        for journal in self._journals:
+            journal.append((property_id, booking_id, stay))
+
+    def add(self, property_id: int, booking_id: int, check_in: datetime, check_out: datetime):
+        self._write(property_id, booking_id, (check_in, check_out))
+
+    def discard(self, property_id: int, booking_id: int):
+        self._write(property_id, booking_id, None)
+
+    def sync(self, booking: Booking, old_property_id: Optional[int] = None):
+        """Mirror a booking row after it was written: approved rows are kept, the rest dropped."""
+        if old_property_id is not None and old_property_id != booking.property_id:
+            self.discard(old_property_id, booking.id)
+        if booking.status == BookingStatusChoices.approved:
+            self.add(booking.property_id, booking.id, booking.check_in, booking.check_out)
+        else:
+            self.discard(booking.property_id, booking.id)
+
+    def is_free(self, property_id: int, check_in: datetime, check_out: datetime) -> bool:
+        calendar = self._calendars.get(property_id)
+        return calendar is None or not calendar.overlaps(check_in, check_out)
+
+    def bulk_is_free(self, queries: Iterable[Tuple[int, datetime, datetime]]) -> List[bool]:
+        calendars = self._calendars
+        result = []
+        for property_id, check_in, check_out in queries:
+            calendar = calendars.get(property_id)
+            result.append(calendar is None or not calendar.overlaps(check_in, check_out))
+        return result
+
+    def booked(self, property_id: int, start: datetime, end: datetime) -> List[Tuple[datetime, datetime, int]]:
+        calendar = self._calendars.get(property_id)
+        return calendar.booked(start, end) if calendar is not None else []
+
+    async def read_booked(self, db, property_id: int, start: datetime,
+                          end: datetime) -> List[Tuple[datetime, datetime, int]]:
+        """booked(), but windows starting before ``horizon`` come from the table
+        (one probe of ix_booking_approved_property_check_out)."""
+        if not self.loaded:
+            await self.load(db)
+        if start >= self.horizon:
+            return self.booked(property_id, start, end)
+        rows = await db.execute(
+            select(Booking.check_in, Booking.check_out, Booking.id)
+            .where(Booking.property_id == property_id,
+                   Booking.status == BookingStatusChoices.approved,
+                   Booking.check_out > start,
+                   Booking.check_in < end)
+            .order_by(Booking.check_in, Booking.check_out, Booking.id)
+        )
+        return [tuple(row) for row in rows]
+
+    async def load(self, db):
+        journal: List[Tuple[int, int, Optional[Tuple[datetime, datetime]]]] = []
+        self._journals.append(journal)
+        horizon = datetime.utcnow()
+        try:
+            # served by ix_booking_approved_check_out, past stays are not read
+            rows = await db.execute(
+                select(Booking.property_id, Booking.id, Booking.check_in, Booking.check_out)
+                .where(Booking.status == BookingStatusChoices.approved,
+                       Booking.check_out >= horizon)
+            )
+        finally:
+            self._journals.remove(journal)
+        stays: Dict[int, List[Tuple[datetime, datetime, int]]] = {}
+        for property_id, booking_id, check_in, check_out in rows:
+            stays.setdefault(property_id, []).append((check_in, check_out, booking_id))
+        calendars = {property_id: PropertyCalendar.from_stays(property_stays)
+                     for property_id, property_stays in stays.items()}
+        # sync()/discard() calls made while the query was running may be missing from its snapshot
+        for property_id, booking_id, stay in journal:
+            self._apply(calendars, property_id, booking_id, stay)
+        self._calendars = calendars
+        self.horizon = horizon
+        self.loaded = True
+
+
+logger = logging.getLogger(__name__)
+
+availability_index = AvailabilityIndex()
+
+
+async def refresh_availability(session_factory, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_factory() as db:
+                await availability_index.load(db)
+        except Exception:
+            logger.exception('availability index reload failed')
@@ -0,0 +1,52 @@
+"""Bulk INSERTs that say which input item the database rejected.
+
+The batch goes in as one multi-row INSERT. If the database refuses it (a
+foreign key whose row vanished after the checks, a unique race, a value
+too long for its column), the driver error names no row, so the items are
+replayed one by one in savepoints to find the failing ones; the whole
+request is then rolled back and answered with per-item errors, like the
+pydantic and ownership checks before it.
+"""
+from typing import Any, Dict, List, Sequence
+from fastapi import HTTPException
+from sqlalchemy.exc import DBAPIError, DataError, IntegrityError
+
+
+def _rejected(exc: DBAPIError) -> bool:
+    return isinstance(exc, IntegrityError) or _bad_value(exc)
+
+
+def _bad_value(exc: DBAPIError) -> bool:
+    """SQLSTATE class 22, e.g. a string too long for its column (asyncpg reports it as a bare DBAPIError)."""
+    return isinstance(exc, DataError) or str(getattr(exc.orig, 'sqlstate', None) or '').startswith('22')
+
+
+async def insert_items(db, statement, values: Sequence[Dict[str, Any]]) -> List[Any]:
+    """Rows RETURNING'd by ``statement`` in input order.
+
+    On rejection: 409 if any item hit a constraint, else 422 (values the column refuses).
+    """
+    try:
+        return (await db.execute(statement, values)).all()
+    except DBAPIError as exc:
+        if not _rejected(exc):
+            raise
+        await db.rollback()
+
+    rows, errors, status = [], [], 422
+    for index, item in enumerate(values):
+        try:
+            async with db.begin_nested():
+                rows += (await db.execute(statement, [item])).all()
+        except IntegrityError:
+            status = 409
+            errors.append({'index': index, 'detail': 'Конфликт с данными в базе'})
+        except DBAPIError as exc:
+            if not _bad_value(exc):
+                raise
+            errors.append({'index': index, 'detail': 'Недопустимое значение для базы'})
+    if not errors:
+        # whatever failed the batch is gone (a concurrent write rolled back); keep the rows
+        return rows
+    await db.rollback()
+    raise HTTPException(status_code=status, detail=errors)
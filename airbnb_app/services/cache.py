@@ -0,0 +1,87 @@
+"""Small in-process LRU cache with a TTL and a memory budget.
+
+Single-threaded use from the event loop only; each worker has its own copy.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterator, Optional, Tuple
+
+
+class LRUCache:
+    def __init__(self, max_bytes: int, ttl: float, sizeof: Callable[[Any], int] = len):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sizeof = sizeof
+        self._data: 'OrderedDict[Hashable, Tuple[float, int, Any]]' = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, _, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        if key in self._data:
+            self._remove(key)
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, size, value)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def discard(self, key: Hashable) -> bool:
+        if key not in self._data:
+            return False
+        self._remove(key)
+        self.invalidations += 1
+        return True
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        """Snapshot of live entries, without touching LRU order."""
+        return iter([(key, entry[2]) for key, entry in self._data.items()])
+
+    def clear(self):
+        self.invalidations += len(self._data)
+        self._data.clear()
+        self._bytes = 0
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._data),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
@@ -0,0 +1,58 @@
+"""Conditional GET: ETag / Last-Modified validators and 304 answers.
+
+Handlers compute a version from a cheap probe (timestamps and counts, no row
+bodies) or from an already rendered page, and skip the full load when the
+client's If-None-Match still matches.
+
+List pages use page_version(): count, id sum and latest updated_at of the
+rows the page query returns (look-ahead row included). Any edit of a row on
+the page moves updated_at, rows entering or leaving move count and id sum.
+The same triple comes from the fetched rows or, for a revalidation,
+from page_version_query() without loading or serializing the rows.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Optional, Sequence, Tuple
+from fastapi import Response
+from sqlalchemy import select, func
+
+
+def make_etag(*parts) -> str:
+    return '"' + hashlib.sha1(repr(parts).encode()).hexdigest()[:24] + '"'
+
+
+def body_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest()[:24] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # weak comparison (RFC 9110 13.1.2): W/ prefixes are ignored
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
+
+
+def validators(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    # no-cache: clients may keep the body but must revalidate, which is now a cheap 304
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if last_modified is not None:
+        # naive datetimes in the db are UTC (datetime.utcnow)
+        headers['Last-Modified'] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
+
+
+def page_version(rows: Sequence) -> Tuple[int, int, Optional[datetime]]:
+    return len(rows), sum(row.id for row in rows), max((row.updated_at for row in rows), default=None)
+
+
+def page_version_query(query):
+    """page_version() of ``query``'s rows in one aggregate; the query must select id and updated_at."""
+    page = query.subquery()
+    return select(func.count(), func.coalesce(func.sum(page.c.id), 0), func.max(page.c.updated_at))
@@ -0,0 +1,65 @@
+"""Streaming exports: NDJSON or CSV written straight from a server-side cursor.
+
+Rows are fetched EXPORT_BATCH_SIZE at a time and each batch is serialized and
+sent before the next one is read, so memory stays flat however large the table.
+"""
+import csv
+import io
+import json
+from typing import Optional, Type
+from fastapi import Header, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from airbnb_app.cinfig import EXPORT_BATCH_SIZE
+from airbnb_app.db.database import ReadSessionLocal
+
+
+NDJSON = 'application/x-ndjson'
+CSV = 'text/csv'
+
+
+def export_format(fmt: Optional[str] = Query(None, alias='format', pattern='^(ndjson|csv)$'),
+                  accept: Optional[str] = Header(None)) -> Optional[str]:
+    """``?format=`` wins; otherwise ``Accept: application/x-ndjson`` selects NDJSON."""
+    if fmt:
+        return fmt
+    if accept and NDJSON in accept:
+        return 'ndjson'
+    return None
+
+
+async def _batches(query):
+    # own session: the request's dependency session may be closed before the body is sent
+    async with ReadSessionLocal() as db:
+        result = await db.stream_scalars(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for batch in result.partitions():
+            yield batch
+
+
+async def _ndjson(query, schema: Type[BaseModel]):
+    async for batch in _batches(query):
+        yield ''.join(schema.model_validate(row).model_dump_json() + '\n' for row in batch)
+
+
+async def _csv(query, schema: Type[BaseModel]):
+    fields = list(schema.model_fields)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    async for batch in _batches(query):
+        for row in batch:
+            data = schema.model_validate(row).model_dump(mode='json')
+            writer.writerow([json.dumps(data[field]) if isinstance(data[field], (dict, list)) else data[field]
+                             for field in fields])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_export(query, schema: Type[BaseModel], fmt: str, name: str) -> StreamingResponse:
+    if fmt == 'csv':
+        return StreamingResponse(_csv(query, schema), media_type=CSV,
+                                 headers={'Content-Disposition': f'attachment; filename="{name}.csv"'})
+    return StreamingResponse(_ndjson(query, schema), media_type=NDJSON)
@@ -0,0 +1,80 @@
+"""Radius and bounding-box search over the Property.geo_cell grids.
+
+A box is turned into one ``geo_cell BETWEEN a AND b`` range per grid row it
+spans, which ix_property_approved_geo_cell answers with a few short index
+scans however many listings exist; the exact latitude/longitude bounds and
+the haversine distance are then checked on those candidates only. Boxes
+too tall for the 0.1 degree grid use the 1 degree one (geo_cell_coarse);
+anything taller still is a range scan of ix_property_approved_lat_lon.
+Plain SQL and trigonometric functions only, so it runs on PostgreSQL
+without PostGIS. Boxes are not wrapped across the antimeridian.
+"""
+import math
+from typing import NamedTuple, Optional
+from sqlalchemy import and_, or_, func
+from airbnb_app.db.models import Property, GEO_CELLS_PER_DEGREE, GEO_COARSE_CELLS_PER_DEGREE
+
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# finest level first; a level is used when the box spans fewer rows than this
+GRID_LEVELS = ((Property.geo_cell, GEO_CELLS_PER_DEGREE),
+               (Property.geo_cell_coarse, GEO_COARSE_CELLS_PER_DEGREE))
+MAX_GRID_ROWS = 64
+
+
+class BBox(NamedTuple):
+    min_lat: float
+    min_lon: float
+    max_lat: float
+    max_lon: float
+
+    def contains(self, lat: Optional[float], lon: Optional[float]) -> bool:
+        return (lat is not None and lon is not None
+                and self.min_lat <= lat <= self.max_lat and self.min_lon <= lon <= self.max_lon)
+
+
+def around(lat: float, lon: float, radius_km: float) -> BBox:
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = min(180.0, dlat / max(math.cos(math.radians(lat)), 1e-6))
+    return BBox(max(-90.0, lat - dlat), max(-180.0, lon - dlon), min(90.0, lat + dlat), min(180.0, lon + dlon))
+
+
+def _row(lat: float, cells_per_degree: int = GEO_CELLS_PER_DEGREE) -> int:
+    return math.floor((lat + 90) * cells_per_degree)
+
+
+def _column(lon: float, cells_per_degree: int = GEO_CELLS_PER_DEGREE) -> int:
+    return math.floor((lon + 180) * cells_per_degree)
+
+
+def within(box: BBox):
+    exact = and_(Property.latitude.between(box.min_lat, box.max_lat),
+                 Property.longitude.between(box.min_lon, box.max_lon))
+    for column, cells_per_degree in GRID_LEVELS:
+        first_row, last_row = _row(box.min_lat, cells_per_degree), _row(box.max_lat, cells_per_degree)
+        if last_row - first_row >= MAX_GRID_ROWS:
+            continue
+        first_column, last_column = _column(box.min_lon, cells_per_degree), _column(box.max_lon, cells_per_degree)
+        row_width = 360 * cells_per_degree
+        cells = or_(*(column.between(row * row_width + first_column, row * row_width + last_column)
+                      for row in range(first_row, last_row + 1)))
+        return and_(cells, exact)
+    # wider than 64 degrees of latitude: ix_property_approved_lat_lon
+    return exact
+
+
+def distance_km(lat: float, lon: float):
+    """Haversine distance from (lat, lon) to the row, as a SQL expression."""
+    dlat = func.radians(Property.latitude - lat) / 2
+    dlon = func.radians(Property.longitude - lon) / 2
+    a = (func.sin(dlat) * func.sin(dlat)
+         + math.cos(math.radians(lat)) * func.cos(func.radians(Property.latitude)) * func.sin(dlon) * func.sin(dlon))
+    return 2 * EARTH_RADIUS_KM * func.asin(func.sqrt(a))
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    dlat = math.radians(lat2 - lat1) / 2
+    dlon = math.radians(lon2 - lon1) / 2
+    a = math.sin(dlat) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
@@ -0,0 +1,105 @@
+"""Content-addressed local storage for uploaded images.
+
+An upload is streamed to a temp file while its sha256 is computed, then moved
+to ``originals/<aa>/<digest>.<ext>``; the same bytes uploaded twice share one
+file. Resizing is CPU-bound, so WebP variants are rendered in a process pool,
+bounded like the bcrypt pool in services/passwords.py.
+"""
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Dict, Tuple
+from fastapi import HTTPException
+from airbnb_app.cinfig import (MEDIA_ROOT, MEDIA_URL, IMAGE_MAX_BYTES, IMAGE_VARIANT_WIDTHS,
+                               IMAGE_WORKERS, IMAGE_MAX_PENDING)
+from .thumbnails import render_variants
+
+
+CONTENT_TYPES = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+    'image/gif': 'gif',
+}
+
+# spawn: the app process has threads (bcrypt pool, db drivers), forking it is unsafe
+_executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+_pending = 0
+
+
+def media_url(relative_path: str) -> str:
+    return f"{MEDIA_URL.rstrip('/')}/{relative_path}"
+
+
+def _shard(kind: str, digest: str) -> str:
+    return os.path.join(kind, digest[:2])
+
+
+def ensure_dirs():
+    os.makedirs(os.path.join(MEDIA_ROOT, 'tmp'), exist_ok=True)
+
+
+async def store_upload(chunks: AsyncIterator[bytes], content_type: str) -> Tuple[str, str, bool]:
+    """Stream ``chunks`` to disk; return (digest, original path relative to MEDIA_ROOT, created)."""
+    extension = CONTENT_TYPES.get((content_type or '').split(';')[0].strip().lower())
+    if extension is None:
+        raise HTTPException(status_code=415, detail='Поддерживаются только JPEG, PNG, WebP и GIF')
+
+    ensure_dirs()
+    tmp_path = os.path.join(MEDIA_ROOT, 'tmp', uuid.uuid4().hex)
+    sha = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, 'wb') as tmp:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > IMAGE_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail='Файл слишком большой')
+                sha.update(chunk)
+                await asyncio.to_thread(tmp.write, chunk)
+        if not size:
+            raise HTTPException(status_code=400, detail='Пустой файл')
+
+        digest = sha.hexdigest()
+        relative_path = os.path.join(_shard('originals', digest), f'{digest}.{extension}')
+        path = os.path.join(MEDIA_ROOT, relative_path)
+        if os.path.exists(path):
+            return digest, relative_path, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        return digest, relative_path, True
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+async def make_variants(digest: str, relative_path: str) -> Dict[str, str]:
+    """Render the WebP variants off the event loop; return {width: url}."""
+    global _pending
+    if _pending >= IMAGE_MAX_PENDING:
+        raise HTTPException(status_code=503, detail='Сервер перегружен, попробуйте позже',
+                            headers={'Retry-After': '1'})
+    variants_dir = _shard('variants', digest)
+    _pending += 1
+    try:
+        names = await asyncio.get_running_loop().run_in_executor(
+            _executor, render_variants, os.path.join(MEDIA_ROOT, relative_path),
+            os.path.join(MEDIA_ROOT, variants_dir), digest, IMAGE_VARIANT_WIDTHS)
+    except ValueError:
+        raise HTTPException(status_code=415, detail='Не удалось прочитать изображение')
+    finally:
+        _pending -= 1
+    return {width: media_url(os.path.join(variants_dir, name)) for width, name in names.items()}
+
+
+def discard(relative_path: str):
+    path = os.path.join(MEDIA_ROOT, relative_path)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,169 @@
+"""Per-property nightly occupancy bitmaps (the property_occupancy table).
+
+Each row holds one year of nights as a bitset; in memory it is a plain int,
+so a month calendar, a booked-night count or a "N free nights in a row"
+search is a handful of shifts and ANDs over the whole range instead of a
+loop over booking rows. Only approved bookings occupy nights. Rows are
+recomputed from the booking table for the affected years whenever a
+booking is approved, changed, cancelled or deleted, and rebuild_occupancy()
+regenerates the whole table from scratch.
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Set, Tuple
+from sqlalchemy import select, delete, insert, text
+from sqlalchemy.exc import IntegrityError
+from airbnb_app.db.models import Booking, BookingStatusChoices, PropertyOccupancy
+
+
+YEAR_BYTES = 46  # 366 nights
+
+
+def _nights(check_in: datetime, check_out: datetime) -> Tuple[date, date]:
+    """First night and the day after the last one; a stay covers at least one night."""
+    first = check_in.date()
+    return first, max(check_out.date(), first + timedelta(days=1))
+
+
+def stay_years(check_in: datetime, check_out: datetime) -> Set[int]:
+    first, end = _nights(check_in, check_out)
+    return set(range(first.year, (end - timedelta(days=1)).year + 1))
+
+
+def stay_mask(check_in: datetime, check_out: datetime, year: int) -> int:
+    """Bits of ``year`` covered by the stay."""
+    first, end = _nights(check_in, check_out)
+    jan1 = date(year, 1, 1)
+    start = max((first - jan1).days, 0)
+    stop = min((end - jan1).days, (date(year + 1, 1, 1) - jan1).days)
+    return ((1 << (stop - start)) - 1) << start if stop > start else 0
+
+
+def to_bytes(mask: int) -> bytes:
+    return mask.to_bytes(YEAR_BYTES, 'little')
+
+
+def from_bytes(nights: bytes) -> int:
+    return int.from_bytes(nights, 'little')
+
+
+async def refresh_occupancy(db, property_id: int, years: Iterable[int]):
+    """Recompute the bitmaps of ``years`` from approved bookings and commit.
+
+    Called after the booking change itself is committed. Existing rows are
+    locked first, so concurrent refreshes of one property serialize; years
+    left without stays lose their row.
+    """
+    years = sorted(set(years))
+    if not years:
+        return
+    for attempt in range(2):
+        rows = {row.year: row for row in (await db.execute(
+            select(PropertyOccupancy)
+            .where(PropertyOccupancy.property_id == property_id, PropertyOccupancy.year.in_(years))
+            .with_for_update()
+        )).scalars()}
+        stays = (await db.execute(
+            select(Booking.check_in, Booking.check_out)
+            .where(Booking.property_id == property_id,
+                   Booking.status == BookingStatusChoices.approved,
+                   Booking.check_out > datetime(years[0], 1, 1),
+                   Booking.check_in < datetime(years[-1] + 1, 1, 1))
+        )).all()
+        for year in years:
+            mask = 0
+            for check_in, check_out in stays:
+                mask |= stay_mask(check_in, check_out, year)
+            if not mask:
+                # same as rebuild_occupancy: years without stays have no row
+                if year in rows:
+                    await db.delete(rows[year])
+            elif year in rows:
+                rows[year].nights = to_bytes(mask)
+            else:
+                db.add(PropertyOccupancy(property_id=property_id, year=year, nights=to_bytes(mask)))
+        try:
+            await db.commit()
+            return
+        except IntegrityError:
+            # a concurrent refresh inserted the same year first; recompute over its row
+            await db.rollback()
+            if attempt:
+                raise
+
+
+async def rebuild_occupancy(db) -> int:
+    """Regenerate every bitmap from the booking table, returns the number of rows written.
+
+    The table is locked against writers before the bookings are read:
+    refresh_occupancy() calls wait (their FOR UPDATE conflicts with the
+    lock) and recompute after the commit, so none of them is overwritten by
+    a bitmap built from an older booking snapshot. Readers are not blocked.
+    """
+    if db.get_bind().dialect.name == 'postgresql':
+        # SQLite (tests) has no table locks
+        await db.execute(text('LOCK TABLE property_occupancy IN EXCLUSIVE MODE'))
+    masks: Dict[Tuple[int, int], int] = {}
+    stays = await db.stream(
+        select(Booking.property_id, Booking.check_in, Booking.check_out)
+        .where(Booking.status == BookingStatusChoices.approved)
+        .execution_options(yield_per=10000)
+    )
+    async for property_id, check_in, check_out in stays:
+        for year in stay_years(check_in, check_out):
+            key = (property_id, year)
+            masks[key] = masks.get(key, 0) | stay_mask(check_in, check_out, year)
+    await db.execute(delete(PropertyOccupancy))
+    if masks:
+        await db.execute(insert(PropertyOccupancy), [
+            {'property_id': property_id, 'year': year, 'nights': to_bytes(mask)}
+            for (property_id, year), mask in masks.items()
+        ])
+    await db.commit()
+    return len(masks)
+
+
+async def load_window(db, property_id: int, start: date, end: date) -> Tuple[int, int]:
+    """Booked nights in [start, end) as one bitset (bit 0 = ``start``) and its length."""
+    rows = dict((await db.execute(
+        select(PropertyOccupancy.year, PropertyOccupancy.nights)
+        .where(PropertyOccupancy.property_id == property_id,
+               PropertyOccupancy.year.between(start.year, (end - timedelta(days=1)).year))
+    )).all())
+    length = (end - start).days
+    mask = 0
+    for year, nights in rows.items():
+        offset = (date(year, 1, 1) - start).days
+        bits = from_bytes(nights)
+        mask |= bits << offset if offset >= 0 else bits >> -offset
+    return mask & ((1 << length) - 1), length
+
+
+def booked_nights(mask: int) -> int:
+    return bin(mask).count('1')
+
+
+def free_starts(mask: int, length: int, nights: int) -> int:
+    """Bits where ``nights`` consecutive free nights begin inside the window.
+
+    Log-step AND of the free bitset with itself shifted: after covering
+    ``run`` nights, bit i means nights i .. i+run-1 are all free.
+    """
+    if nights > length:
+        return 0
+    free = ~mask & ((1 << length) - 1)
+    run = 1
+    while run < nights:
+        step = min(run, nights - run)
+        free &= free >> step
+        run += step
+    return free & ((1 << (length - nights + 1)) - 1)
+
+
+def days(mask: int, start: date) -> List[date]:
+    """Dates of the set bits."""
+    result = []
+    while mask:
+        low = mask & -mask
+        result.append(start + timedelta(days=low.bit_length() - 1))
+        mask ^= low
+    return result
@@ -0,0 +1,143 @@
+"""Transactional outbox: side effects of a write, run off the request path.
+
+A handler adds ``OutboxEvent`` rows next to its own changes and commits
+once, so the change and its side effects are stored atomically. Every
+worker runs dispatch_outbox(): it claims due events in batches (SKIP LOCKED
+on PostgreSQL, so workers do not take the same rows), runs the handler
+registered for each kind and deletes the rows in the same transaction.
+Delivery is at-least-once -- a crash before the commit replays the batch --
+so handlers must tolerate seeing an event again. An event that still fails
+after OUTBOX_MAX_ATTEMPTS is dead-lettered: logged with its payload and
+last error at ERROR level, counted in outbox_stats() and deleted.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List
+from sqlalchemy import select, func
+from airbnb_app.cinfig import OUTBOX_BATCH_SIZE, OUTBOX_MAX_ATTEMPTS
+from airbnb_app.db.models import OutboxEvent, Message, Booking, BookingStatusChoices
+
+
+logger = logging.getLogger(__name__)
+
+BOOKING_CREATED = 'booking_created'
+
+MAX_BACKOFF_SECONDS = 600
+
+_wakeup = asyncio.Event()
+
+# this worker's totals since start, see outbox_stats()
+_counters = {'processed': 0, 'retried': 0, 'dead': 0}
+
+
+def event(kind: str, **payload) -> OutboxEvent:
+    return OutboxEvent(kind=kind, payload=payload)
+
+
+def notify():
+    """Run this worker's dispatcher now instead of at the next poll (after the event is committed)."""
+    _wakeup.set()
+
+
+async def create_host_messages(db, events: List[OutboxEvent]):
+    """booking_created -> pending Message for the host, once per booking.
+
+    Bookings deleted before the event ran get no message; their events finish as done.
+    """
+    booking_ids = [e.payload['booking_id'] for e in events]
+    alive = set((await db.scalars(select(Booking.id).where(Booking.id.in_(booking_ids)))).all())
+    existing = set((await db.scalars(select(Message.booking_id)
+                                      .where(Message.booking_id.in_(booking_ids)))).all())
+    for e in events:
+        booking_id = e.payload['booking_id']
+        if booking_id not in alive or booking_id in existing:
+            continue
+        existing.add(booking_id)
+        db.add(Message(status=BookingStatusChoices.pending, booking_id=booking_id,
+                       host_id=e.payload['host_id']))
+    await db.flush()
+
+
+HANDLERS: Dict[str, Callable[..., Awaitable[None]]] = {
+    BOOKING_CREATED: create_host_messages,
+}
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(2 ** attempts, MAX_BACKOFF_SECONDS))
+
+
+async def _run(db, kind: str, events: List[OutboxEvent]):
+    handler = HANDLERS.get(kind)
+    try:
+        if handler is None:
+            raise LookupError(f'no outbox handler for {kind!r}')
+        async with db.begin_nested():
+            await handler(db, events)
+    except Exception as exc:
+        if len(events) > 1:
+            # find the event that fails, let the rest through
+            for e in events:
+                await _run(db, kind, [e])
+            return
+        e = events[0]
+        e.attempts += 1
+        e.last_error = repr(exc)[:1000]
+        if e.attempts >= OUTBOX_MAX_ATTEMPTS:
+            # dead letter: the log line keeps everything needed to replay it by hand
+            logger.error('outbox event %s (%s) dropped after %s attempts, payload=%r: %s',
+                         e.id, kind, e.attempts, e.payload, e.last_error)
+            _counters['dead'] += 1
+            await db.delete(e)
+            return
+        e.available_at = datetime.utcnow() + _backoff(e.attempts)
+        logger.warning('outbox event %s (%s) failed, attempt %s: %r', e.id, kind, e.attempts, exc)
+        _counters['retried'] += 1
+        return
+    for e in events:
+        await db.delete(e)
+    _counters['processed'] += len(events)
+
+
+async def dispatch_batch(db, batch: int = OUTBOX_BATCH_SIZE) -> int:
+    """Process one batch of due events, returns how many were claimed."""
+    events = (await db.scalars(
+        select(OutboxEvent)
+        .where(OutboxEvent.available_at <= datetime.utcnow())
+        .order_by(OutboxEvent.available_at, OutboxEvent.id)
+        .limit(batch)
+        .with_for_update(skip_locked=True)
+    )).all()
+    by_kind: Dict[str, List[OutboxEvent]] = defaultdict(list)
+    for e in events:
+        by_kind[e.kind].append(e)
+    for kind, kind_events in by_kind.items():
+        await _run(db, kind, kind_events)
+    await db.commit()
+    return len(events)
+
+
+async def outbox_stats(db) -> dict:
+    """Backlog in the table plus this worker's counters."""
+    pending, failing = (await db.execute(
+        select(func.count(OutboxEvent.id), func.count(OutboxEvent.id).filter(OutboxEvent.attempts > 0))
+    )).one()
+    return {'pending': pending, 'failing': failing, **_counters}
+
+
+async def dispatch_outbox(session_factory, interval: float):
+    while True:
+        _wakeup.clear()
+        try:
+            async with session_factory() as db:
+                # a full batch means more may be waiting
+                while await dispatch_batch(db) == OUTBOX_BATCH_SIZE:
+                    pass
+        except Exception:
+            logger.exception('outbox dispatch failed')
+        try:
+            await asyncio.wait_for(_wakeup.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,85 @@
+"""Keyset (cursor) pagination helpers.
+
+A cursor is an opaque url-safe token holding the sort name, the sort key of
+the last row on the page and its id, so the next page starts with an index
+seek instead of skipping ``offset`` rows.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+class SortKey(NamedTuple):
+    column: Any
+    descending: bool = False
+    parse: Callable[[Any], Any] = lambda value: value
+
+
+def encode_cursor(sort_name: str, key: Any, row_id: int) -> str:
+    if isinstance(key, datetime):
+        key = key.isoformat()
+    raw = json.dumps([sort_name, key, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _checked(key: Any, column) -> Any:
+    """The key if it fits the sort column's Python type (ints pass for floats), else TypeError."""
+    try:
+        expected = column.type.python_type
+    except NotImplementedError:
+        # untyped expressions (e.g. distance) rely on SortKey.parse alone
+        return key
+    if expected is float and isinstance(key, int) and not isinstance(key, bool):
+        return float(key)
+    if not isinstance(key, expected) or (isinstance(key, bool) and expected is not bool):
+        raise TypeError(f'cursor key {key!r} is not {expected.__name__}')
+    return key
+
+
+def decode_cursor(token: str, sort_name: str, sort_key: SortKey) -> Tuple[Any, int]:
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        name, key, row_id = json.loads(raw)
+        if not isinstance(row_id, int) or isinstance(row_id, bool):
+            raise TypeError(f'cursor id {row_id!r} is not int')
+        if name == sort_name:
+            key = _checked(sort_key.parse(key), sort_key.column)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail='Неверный cursor')
+    if name != sort_name:
+        raise HTTPException(status_code=400, detail='cursor не соответствует order_by')
+    return key, row_id
+
+
+def apply_keyset(query, sort_name: str, sort_key: SortKey, id_column, cursor: Optional[str]):
+    column = sort_key.column
+    same = column is id_column
+    if cursor:
+        key, row_id = decode_cursor(cursor, sort_name, sort_key)
+        if same:
+            query = query.where(id_column < row_id if sort_key.descending else id_column > row_id)
+        else:
+            position = tuple_(column, id_column)
+            after = tuple_(key, row_id)
+            query = query.where(position < after if sort_key.descending else position > after)
+
+    if sort_key.descending:
+        order = [id_column.desc()] if same else [column.desc(), id_column.desc()]
+    else:
+        order = [id_column.asc()] if same else [column.asc(), id_column.asc()]
+    return query.order_by(*order)
+
+
+def split_page(rows: List[Any], limit: int, sort_name: str, sort_key: SortKey) -> Tuple[List[Any], Optional[str]]:
+    """Trim the extra look-ahead row and build the cursor for the following page."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(sort_name, getattr(last, sort_key.column.key), last.id)
@@ -0,0 +1,47 @@
+"""bcrypt hashing off the event loop.
+
+bcrypt releases the GIL, so a small thread pool runs hashes in parallel
+while the loop keeps serving other requests. When more than
+PASSWORD_HASH_MAX_PENDING calls are queued, new ones fail fast with 503
+instead of piling up behind a login storm.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from airbnb_app.cinfig import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING
+
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto",
+                           bcrypt__default_rounds=BCRYPT_ROUNDS,
+                           bcrypt__min_rounds=BCRYPT_ROUNDS,
+                           bcrypt__max_rounds=BCRYPT_ROUNDS)
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='bcrypt')
+_pending = 0
+
+
+async def _run(func, *args):
+    global _pending
+    if _pending >= PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(status_code=503, detail='Сервер перегружен, попробуйте позже',
+                            headers={'Retry-After': '1'})
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _run(pwd_context.hash, password)
+
+
+async def verify_password(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """Return (valid, new_hash); new_hash is set when the stored cost differs from BCRYPT_ROUNDS."""
+    return await _run(pwd_context.verify_and_update, password, hashed)
+
+
+def pending() -> int:
+    return _pending
@@ -0,0 +1,45 @@
+"""Short-lived cache of authenticated users keyed by token subject (username).
+
+Writes to a user in this worker invalidate it right away; other workers see
+the change after PRINCIPAL_CACHE_TTL.
+"""
+from typing import NamedTuple, Optional
+from airbnb_app.cinfig import PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL
+from airbnb_app.db.models import RoleChoices
+from .cache import LRUCache
+
+
+class Principal(NamedTuple):
+    id: int
+    username: str
+    role: RoleChoices
+    is_active: bool
+
+
+class PrincipalCache:
+    def __init__(self, max_entries: int, ttl: float):
+        # every entry weighs 1, so the byte budget is an entry count
+        self._cache = LRUCache(max_entries, ttl, sizeof=lambda principal: 1)
+
+    def get(self, username: str) -> Optional[Principal]:
+        return self._cache.get(username)
+
+    def set(self, principal: Principal):
+        self._cache.set(principal.username, principal)
+
+    def invalidate(self, user_id: Optional[int] = None, username: Optional[str] = None):
+        if username is not None:
+            self._cache.discard(username)
+        if user_id is not None:
+            for key, principal in self._cache.items():
+                if principal.id == user_id:
+                    self._cache.discard(key)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
@@ -0,0 +1,63 @@
+"""Rating aggregates stored on Property.
+
+Changes are applied as a single relative UPDATE inside the caller's
+transaction, so concurrent reviews of one property never lose counts.
+
+Backfill existing data:  python -m airbnb_app.services.ratings
+"""
+from typing import Optional
+from sqlalchemy import update, select, func, cast, Float
+from airbnb_app.db.database import SessionLocal
+from airbnb_app.db.models import Property, Review
+
+
+RATING_COLUMNS = {rating: getattr(Property, f'rating_count_{rating}') for rating in range(1, 6)}
+
+
+def rating_change(property_id: int, added: Optional[int] = None, removed: Optional[int] = None):
+    """UPDATE statement that adds and/or removes one rating (1-5) from a property's aggregates."""
+    delta_count = (added is not None) - (removed is not None)
+    delta_sum = (added or 0) - (removed or 0)
+
+    weighted_sum = sum(rating * column for rating, column in RATING_COLUMNS.items())
+    new_count = Property.rating_count + delta_count
+    values = {
+        'rating_count': new_count,
+        # SET expressions see the old row, so the average is rebuilt from old values + delta
+        'rating_avg': func.coalesce(cast(weighted_sum + delta_sum, Float) / func.nullif(new_count, 0), 0),
+    }
+    if added is not None:
+        values[f'rating_count_{added}'] = RATING_COLUMNS[added] + 1
+    if removed is not None:
+        values[f'rating_count_{removed}'] = RATING_COLUMNS[removed] - 1
+    return update(Property).where(Property.id == property_id).values(values)
+
+
+async def apply_rating_change(db, property_id: int, added: Optional[int] = None,
+                              removed: Optional[int] = None):
+    if added == removed:
+        return
+    await db.execute(rating_change(property_id, added, removed))
+
+
+def backfill_statement():
+    def count_of(*criteria):
+        return select(func.count(Review.id)).where(Review.property_id == Property.id,
+                                                   *criteria).scalar_subquery()
+
+    values = {f'rating_count_{rating}': count_of(Review.rating == rating) for rating in RATING_COLUMNS}
+    values['rating_count'] = count_of()
+    values['rating_avg'] = func.coalesce(
+        select(func.avg(Review.rating)).where(Review.property_id == Property.id).scalar_subquery(), 0)
+    return update(Property).values(values)
+
+
+def backfill() -> int:
+    with SessionLocal() as db:
+        result = db.execute(backfill_statement())
+        db.commit()
+        return result.rowcount
+
+
+if __name__ == '__main__':
+    print(f'updated {backfill()} properties')
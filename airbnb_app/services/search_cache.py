@@ -0,0 +1,110 @@
+"""Cache of rendered /property/ and /property/search/ pages.
+
+Every entry remembers which properties it contains and the filter it was
+built from. A property write drops exactly the entries that contain the
+row or whose filter matches the row before or after the change, because
+only those pages can differ. Other workers pick up changes after the TTL.
+"""
+from typing import Any, Callable, Dict, FrozenSet, NamedTuple, Optional, Sequence
+from fastapi import Response
+from airbnb_app.cinfig import SEARCH_CACHE_MAX_BYTES, SEARCH_CACHE_TTL
+from airbnb_app.db.models import Property
+from airbnb_app.db.schema import PropertySchema
+from .cache import LRUCache
+from .pagination import NEXT_CURSOR_HEADER
+from .serialization import RowEncoder
+from .conditional import (body_etag, etag_matches, validators, not_modified, make_etag,
+                          page_version, page_version_query)
+
+
+STATE_FIELDS = ('is_approved', 'city', 'price_per_night', 'property_type', 'max_guests', 'rating_avg',
+                'latitude', 'longitude')
+
+# pages are built from column rows: property_rows.select(Property.updated_at, ...) in the handlers
+property_rows = RowEncoder(Property, PropertySchema)
+
+
+class CachedPage(NamedTuple):
+    body: bytes
+    headers: Dict[str, str]
+    ids: FrozenSet[int]
+    matches: Callable[[dict], bool]
+    uses_rating: bool
+    uses_dates: bool
+
+    def response(self, if_none_match: Optional[str] = None) -> Response:
+        """The page, or 304 when the client already has it."""
+        if etag_matches(if_none_match, self.headers['ETag']):
+            return not_modified(self.headers)
+        return Response(content=self.body, media_type='application/json', headers=self.headers)
+
+
+def property_state(prop: Property) -> dict:
+    """The fields search filters look at, captured before/after a write."""
+    return {field: getattr(prop, field) for field in STATE_FIELDS}
+
+
+def cache_key(endpoint: str, **params: Any) -> tuple:
+    """Callers normalize values first; unset (None) filters are left out."""
+    return (endpoint, tuple((name, value) for name, value in sorted(params.items()) if value is not None))
+
+
+def page_etag(key: tuple, rows: Sequence) -> str:
+    """ETag of a page from its fetched rows (look-ahead row included)."""
+    return make_etag(key, page_version(rows))
+
+
+async def revalidate(db, key: tuple, query, if_none_match: Optional[str]) -> Optional[Response]:
+    """304 for a page missing from this worker's cache, from one aggregate over ``query``
+    (the page query with its limit) instead of loading and serializing the rows."""
+    if not if_none_match:
+        return None
+    version = tuple((await db.execute(page_version_query(query))).one())
+    etag = make_etag(key, version)
+    return not_modified(validators(etag, version[2])) if etag_matches(if_none_match, etag) else None
+
+
+class SearchCache:
+    def __init__(self, max_bytes: int, ttl: float):
+        self._cache = LRUCache(max_bytes, ttl, sizeof=lambda page: len(page.body) + 256)
+
+    def get(self, key: tuple) -> Optional[CachedPage]:
+        return self._cache.get(key)
+
+    def store(self, key: tuple, rows: Sequence, next_cursor: Optional[str],
+              matches: Callable[[dict], bool], uses_rating: bool = False,
+              if_none_match: Optional[str] = None, uses_dates: bool = False,
+              etag: Optional[str] = None) -> Response:
+        """``etag`` defaults to the body hash; handlers with a cheap version probe pass its etag."""
+        body = property_rows.dumps(rows)
+        last_modified = max((row.updated_at for row in rows), default=None)
+        headers = validators(etag or body_etag(body), last_modified)
+        if next_cursor:
+            headers[NEXT_CURSOR_HEADER] = next_cursor
+        page = CachedPage(body, headers, frozenset(row.id for row in rows), matches, uses_rating, uses_dates)
+        self._cache.set(key, page)
+        return page.response(if_none_match)
+
+    def invalidate_property(self, property_id: int, before: Optional[dict] = None,
+                            after: Optional[dict] = None, rating: bool = False):
+        for key, page in self._cache.items():
+            if (property_id in page.ids
+                    or (rating and page.uses_rating)
+                    or (before is not None and page.matches(before))
+                    or (after is not None and page.matches(after))):
+                self._cache.discard(key)
+
+    def invalidate_dates(self):
+        """An approved booking appeared or went away: pages filtered by check_in/check_out may differ."""
+        for key, page in self._cache.items():
+            if page.uses_dates:
+                self._cache.discard(key)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+search_cache = SearchCache(SEARCH_CACHE_MAX_BYTES, SEARCH_CACHE_TTL)
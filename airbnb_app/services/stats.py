@@ -0,0 +1,73 @@
+"""Admin dashboard figures, recomputed in the background instead of per request."""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+from airbnb_app.db.models import AdminStats, Booking, BookingStatusChoices, Property, UserProfile
+
+
+logger = logging.getLogger(__name__)
+
+STATS_ID = 1
+
+
+async def refresh_stats(db) -> AdminStats:
+    approved = Booking.status == BookingStatusChoices.approved
+    total_users, active_users = (await db.execute(
+        select(func.count(UserProfile.id),
+               func.count(UserProfile.id).filter(UserProfile.is_active == True))
+    )).one()
+    total_bookings, active_bookings, total_revenue = (await db.execute(
+        select(func.count(Booking.id),
+               func.count(Booking.id).filter(approved),
+               func.coalesce(func.sum(Booking.total_price).filter(approved), 0))
+    )).one()
+    popular_cities = (await db.execute(
+        select(Property.city, func.count(Property.id).label("count"))
+        .group_by(Property.city)
+        .order_by(func.count(Property.id).desc())
+        .limit(5)
+    )).all()
+
+    stats = await db.merge(AdminStats(
+        id=STATS_ID,
+        total_users=total_users,
+        active_users=active_users,
+        total_bookings=total_bookings,
+        active_bookings=active_bookings,
+        total_revenue=total_revenue,
+        popular_cities=[{"city": city, "count": count} for city, count in popular_cities],
+        updated_at=datetime.utcnow(),
+    ))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # another worker inserted the row first; its numbers are just as fresh
+        await db.rollback()
+        stats = await db.get(AdminStats, STATS_ID, populate_existing=True)
+    return stats
+
+
+async def get_stats(db) -> AdminStats:
+    """The stored row as is -- its updated_at tells how old it is; computed here only before the first refresh."""
+    stats = await db.get(AdminStats, STATS_ID)
+    return stats if stats is not None else await refresh_stats(db)
+
+
+async def refresh_if_stale(db, max_age: float) -> AdminStats:
+    stats = await db.get(AdminStats, STATS_ID)
+    if stats is None or stats.updated_at < datetime.utcnow() - timedelta(seconds=max_age):
+        stats = await refresh_stats(db)
+    return stats
+
+
+async def refresh_admin_stats(session_factory, interval: float):
+    while True:
+        try:
+            async with session_factory() as db:
+                # every worker runs this loop; skip when another one just refreshed
+                await refresh_if_stale(db, interval)
+        except Exception:
+            logger.exception('admin stats refresh failed')
+        await asyncio.sleep(interval)
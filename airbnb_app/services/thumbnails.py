@@ -0,0 +1,44 @@
+"""WebP variants of an uploaded image. Runs inside the media process pool.
+
+Kept free of app imports so spawned workers start quickly.
+"""
+import os
+from typing import Dict, Iterable
+
+
+def render_variants(source: str, target_dir: str, digest: str, widths: Iterable[int]) -> Dict[str, str]:
+    """Write ``<digest>_<width>.webp`` files into ``target_dir``; return {width: file name}.
+
+    Files that already exist are left alone: identical content always produces
+    identical variants. Raises ``ValueError`` when ``source`` is not a readable image.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    names = {str(width): f'{digest}_{width}.webp' for width in widths}
+    if all(os.path.exists(os.path.join(target_dir, name)) for name in names.values()):
+        return names
+
+    try:
+        with Image.open(source) as original:
+            image = ImageOps.exif_transpose(original)
+            image.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as exc:
+        raise ValueError(str(exc)) from exc
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    os.makedirs(target_dir, exist_ok=True)
+    for width, name in names.items():
+        path = os.path.join(target_dir, name)
+        if os.path.exists(path):
+            continue
+        width = int(width)
+        variant = image
+        if image.width > width:
+            variant = image.resize((width, max(1, round(image.height * width / image.width))),
+                                   Image.LANCZOS)
+        # write then rename, so a half-written file is never served
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        variant.save(tmp_path, 'WEBP', quality=80, method=4)
+        os.replace(tmp_path, path)
+    return names
@@ -0,0 +1,60 @@
+"""Refresh token storage: digests, per-user session cap and expiry sweeping."""
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete
+from airbnb_app.cinfig import (REFRESH_TOKEN_LIFETIME, MAX_SESSIONS_PER_USER,
+                               REFRESH_TOKEN_SWEEP_BATCH)
+from airbnb_app.db.models import RefreshToken
+
+
+logger = logging.getLogger(__name__)
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def new_refresh_token(user_id: int, token: str) -> RefreshToken:
+    now = datetime.utcnow()
+    return RefreshToken(user_id=user_id, token_hash=token_digest(token), create_date=now,
+                        expires_at=now + timedelta(days=REFRESH_TOKEN_LIFETIME))
+
+
+async def find_refresh_token(db, token: str):
+    return await db.scalar(select(RefreshToken).where(RefreshToken.token_hash == token_digest(token),
+                                                      RefreshToken.expires_at > datetime.utcnow()))
+
+
+async def trim_sessions(db, user_id: int, keep: int = MAX_SESSIONS_PER_USER):
+    """Drop the oldest sessions of a user beyond the newest ``keep``."""
+    newest = (select(RefreshToken.id).where(RefreshToken.user_id == user_id)
+              .order_by(RefreshToken.id.desc()).limit(keep))
+    await db.execute(delete(RefreshToken).where(RefreshToken.user_id == user_id,
+                                                RefreshToken.id.not_in(newest.scalar_subquery())))
+
+
+async def sweep_expired(db, batch: int = REFRESH_TOKEN_SWEEP_BATCH) -> int:
+    """Delete expired tokens in batches, committing each so locks stay short."""
+    total = 0
+    while True:
+        expired = (select(RefreshToken.id).where(RefreshToken.expires_at <= datetime.utcnow())
+                   .limit(batch))
+        result = await db.execute(delete(RefreshToken).where(RefreshToken.id.in_(expired.scalar_subquery())))
+        await db.commit()
+        total += result.rowcount
+        if result.rowcount < batch:
+            return total
+
+
+async def sweep_refresh_tokens(session_factory, interval: float):
+    while True:
+        try:
+            async with session_factory() as db:
+                removed = await sweep_expired(db)
+            if removed:
+                logger.info('removed %s expired refresh tokens', removed)
+        except Exception:
+            logger.exception('refresh token sweep failed')
+        await asyncio.sleep(interval)
@@ -0,0 +1,44 @@
+"""booking overlap index
+
+Revision ID: 1498c6c9722b
+Revises: 947bb5be3582
+Create Date: 2026-10-18 17:26:44.905118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1498c6c9722b'
+down_revision: Union[str, None] = '947bb5be3582'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+APPROVED = "status = 'approved'"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # check_out before check_in: overlap probes range over check_out > :check_in, past stays are skipped
+    with op.get_context().autocommit_block():
+        op.create_index('ix_booking_approved_property_check_out', 'booking',
+                        ['property_id', 'check_out', 'check_in'], unique=False,
+                        postgresql_where=sa.text(APPROVED),
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_booking_approved_property_dates', table_name='booking',
+                      postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_booking_approved_property_dates', 'booking',
+                        ['property_id', 'check_in', 'check_out'], unique=False,
+                        postgresql_where=sa.text(APPROVED),
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_booking_approved_property_check_out', table_name='booking',
+                      postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,45 @@
+"""property text search
+
+Revision ID: 1e302dbd0802
+Revises: 287545f455c1
+Create Date: 2026-10-18 11:48:05.331270
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1e302dbd0802'
+down_revision: Union[str, None] = '287545f455c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# must match property_search_vector in db/models.py
+SEARCH_DOCUMENT = "to_tsvector('simple', title || ' ' || description || ' ' || city || ' ' || address)"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_property_city_trgm', 'property', ['city'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'},
+                        postgresql_where=sa.text('is_approved'),
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_property_search', 'property', [sa.text(SEARCH_DOCUMENT)], unique=False,
+                        postgresql_using='gin', postgresql_where=sa.text('is_approved'),
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_property_search', table_name='property', postgresql_concurrently=True,
+                      if_exists=True)
+        op.drop_index('ix_property_city_trgm', table_name='property', postgresql_concurrently=True,
+                      if_exists=True)
@@ -0,0 +1,60 @@
+"""booking no overlap
+
+Revision ID: 287545f455c1
+Revises: c4428811bb28
+Create Date: 2026-10-18 11:02:17.604518
+
+ADD CONSTRAINT ... EXCLUDE builds its GiST index while holding an ACCESS
+EXCLUSIVE lock on booking (there is no CONCURRENTLY form for exclusion
+constraints): reads and writes of booking wait for the whole build. Run it
+off-peak. lock_timeout keeps it from queueing behind a long transaction
+and stalling everything behind it; on timeout simply run it again.
+
+Approved bookings that already overlap would abort the build halfway, so
+they are looked up first and reported; reject or move one of each pair,
+then rerun.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '287545f455c1'
+down_revision: Union[str, None] = 'c4428811bb28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# pairs of approved bookings the constraint would reject; probes ix_booking_approved_property_dates
+OVERLAPS = (
+    "SELECT a.property_id, a.id, b.id FROM booking a "
+    "JOIN booking b ON b.property_id = a.property_id AND b.id > a.id AND b.status = 'approved' "
+    "AND b.check_in < a.check_out AND b.check_out > a.check_in "
+    "WHERE a.status = 'approved' ORDER BY a.property_id, a.id, b.id LIMIT 50"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # nothing to look at when only generating SQL (--sql)
+    overlaps = [] if op.get_context().as_sql else op.get_bind().exec_driver_sql(OVERLAPS).all()
+    if overlaps:
+        pairs = '\n'.join(f'  property {property_id}: bookings {first} and {second}'
+                          for property_id, first, second in overlaps)
+        raise RuntimeError(f'approved bookings overlap ({len(overlaps)} pairs shown, at most 50), '
+                           f'resolve them before adding booking_approved_no_overlap:\n{pairs}')
+
+    # gist needs btree_gist for the plain "property_id WITH =" part
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute("SET LOCAL lock_timeout = '5s'")
+    op.execute(
+        "ALTER TABLE booking ADD CONSTRAINT booking_approved_no_overlap "
+        "EXCLUDE USING gist (property_id WITH =, tsrange(check_in, check_out) WITH &&) "
+        "WHERE (status = 'approved')"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('booking_approved_no_overlap', 'booking')
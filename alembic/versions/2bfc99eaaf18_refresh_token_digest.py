@@ -0,0 +1,58 @@
+"""refresh token digest
+
+Revision ID: 2bfc99eaaf18
+Revises: 31fac20c2194
+Create Date: 2026-10-18 13:52:09.771345
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from airbnb_app.cinfig import REFRESH_TOKEN_LIFETIME
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2bfc99eaaf18'
+down_revision: Union[str, None] = '31fac20c2194'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('refresh_token', sa.Column('token_hash', sa.String(length=64), nullable=True))
+    op.add_column('refresh_token', sa.Column('expires_at', sa.DateTime(), nullable=True))
+    op.execute(
+        "UPDATE refresh_token SET "
+        "token_hash = encode(sha256(convert_to(token, 'UTF8')), 'hex'), "
+        f"expires_at = create_date + interval '{REFRESH_TOKEN_LIFETIME} days'"
+    )
+    op.execute("DELETE FROM refresh_token WHERE expires_at <= now() AT TIME ZONE 'utc'")
+    op.alter_column('refresh_token', 'token_hash', nullable=False)
+    op.alter_column('refresh_token', 'expires_at', nullable=False)
+    op.drop_index('ix_refresh_token_token', table_name='refresh_token', if_exists=True)
+    op.drop_column('refresh_token', 'token')
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_refresh_token_token_hash', 'refresh_token', ['token_hash'], unique=True,
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_refresh_token_expires_at', 'refresh_token', ['expires_at'], unique=False,
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_refresh_token_user_id', 'refresh_token', ['user_id', 'id'], unique=False,
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # digests cannot be turned back into tokens: every session is logged out
+    with op.get_context().autocommit_block():
+        for name in ('ix_refresh_token_user_id', 'ix_refresh_token_expires_at',
+                     'ix_refresh_token_token_hash'):
+            op.drop_index(name, table_name='refresh_token', postgresql_concurrently=True, if_exists=True)
+
+    op.execute('DELETE FROM refresh_token')
+    op.add_column('refresh_token', sa.Column('token', sa.String(), nullable=False))
+    op.create_index('ix_refresh_token_token', 'refresh_token', ['token'], unique=False)
+    op.drop_column('refresh_token', 'expires_at')
+    op.drop_column('refresh_token', 'token_hash')
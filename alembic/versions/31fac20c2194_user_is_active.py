@@ -0,0 +1,29 @@
+"""user is_active
+
+Revision ID: 31fac20c2194
+Revises: 6e73bd507507
+Create Date: 2026-10-18 13:14:40.517203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '31fac20c2194'
+down_revision: Union[str, None] = '6e73bd507507'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('user_profile', sa.Column('is_active', sa.Boolean(), server_default=sa.text('true'),
+                                            nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('user_profile', 'is_active')
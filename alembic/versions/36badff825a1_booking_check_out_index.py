@@ -0,0 +1,34 @@
+"""booking check_out index
+
+Revision ID: 36badff825a1
+Revises: 6dbfc9b29a10
+Create Date: 2026-10-18 19:32:08.271645
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '36badff825a1'
+down_revision: Union[str, None] = '6dbfc9b29a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # AvailabilityIndex.load() reads approved stays with check_out >= now across all properties
+    with op.get_context().autocommit_block():
+        op.create_index('ix_booking_approved_check_out', 'booking', ['check_out'], unique=False,
+                        postgresql_where=sa.text("status = 'approved'"),
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_booking_approved_check_out', table_name='booking',
+                      postgresql_concurrently=True, if_exists=True)
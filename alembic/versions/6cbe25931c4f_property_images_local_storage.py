@@ -0,0 +1,38 @@
+"""property images local storage
+
+Revision ID: 6cbe25931c4f
+Revises: bcacfa1c344c
+Create Date: 2026-10-18 15:12:44.218907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6cbe25931c4f'
+down_revision: Union[str, None] = 'bcacfa1c344c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('property_images', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('property_images', sa.Column('variants', sa.JSON(), nullable=True))
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_property_images_property_hash', 'property_images', ['property_id', 'content_hash'],
+                        unique=True, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_property_images_property_hash', table_name='property_images',
+                      postgresql_concurrently=True, if_exists=True)
+
+    op.drop_column('property_images', 'variants')
+    op.drop_column('property_images', 'content_hash')
@@ -0,0 +1,61 @@
+"""property rating aggregates
+
+Revision ID: 6e73bd507507
+Revises: 1e302dbd0802
+Create Date: 2026-10-18 12:30:52.908114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e73bd507507'
+down_revision: Union[str, None] = '1e302dbd0802'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COUNT_COLUMNS = ['rating_count', 'rating_count_1', 'rating_count_2', 'rating_count_3',
+                 'rating_count_4', 'rating_count_5']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('property', sa.Column('rating_avg', sa.Float(), server_default=sa.text('0'),
+                                        nullable=False))
+    for name in COUNT_COLUMNS:
+        op.add_column('property', sa.Column(name, sa.Integer(), server_default=sa.text('0'),
+                                            nullable=False))
+
+    # fill from existing reviews; later changes go through services/ratings.py
+    op.execute(
+        "UPDATE property SET "
+        "rating_count = r.total, rating_avg = r.average, "
+        "rating_count_1 = r.c1, rating_count_2 = r.c2, rating_count_3 = r.c3, "
+        "rating_count_4 = r.c4, rating_count_5 = r.c5 "
+        "FROM (SELECT property_id, count(*) AS total, avg(rating) AS average, "
+        "count(*) FILTER (WHERE rating = 1) AS c1, count(*) FILTER (WHERE rating = 2) AS c2, "
+        "count(*) FILTER (WHERE rating = 3) AS c3, count(*) FILTER (WHERE rating = 4) AS c4, "
+        "count(*) FILTER (WHERE rating = 5) AS c5 "
+        "FROM review GROUP BY property_id) AS r "
+        "WHERE property.id = r.property_id"
+    )
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_property_approved_rating', 'property', ['rating_avg', 'id'], unique=False,
+                        postgresql_where=sa.text('is_approved'),
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_property_approved_rating', table_name='property',
+                      postgresql_concurrently=True, if_exists=True)
+
+    for name in reversed(COUNT_COLUMNS):
+        op.drop_column('property', name)
+    op.drop_column('property', 'rating_avg')
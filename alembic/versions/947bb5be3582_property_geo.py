@@ -0,0 +1,61 @@
+"""property geo
+
+Revision ID: 947bb5be3582
+Revises: a6e0355c0bdd
+Create Date: 2026-10-18 16:52:07.318245
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '947bb5be3582'
+down_revision: Union[str, None] = 'a6e0355c0bdd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# same numbering as geo_cell_sql() in db/models.py: 0.1 degree cells and 1 degree cells
+GEO_CELL = ('CASE WHEN latitude IS NULL OR longitude IS NULL THEN NULL'
+            ' ELSE CAST(floor((latitude + 90) * 10) AS INTEGER) * 3600'
+            ' + CAST(floor((longitude + 180) * 10) AS INTEGER) END')
+GEO_CELL_COARSE = ('CASE WHEN latitude IS NULL OR longitude IS NULL THEN NULL'
+                   ' ELSE CAST(floor((latitude + 90) * 1) AS INTEGER) * 360'
+                   ' + CAST(floor((longitude + 180) * 1) AS INTEGER) END')
+
+INDEXES = [
+    ('ix_property_approved_geo_cell', ['geo_cell']),
+    ('ix_property_approved_geo_cell_coarse', ['geo_cell_coarse']),
+    ('ix_property_approved_lat_lon', ['latitude', 'longitude']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('property', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('property', sa.Column('longitude', sa.Float(), nullable=True))
+    # a stored generated column rewrites the table once; all rows are NULL until coordinates are set
+    op.add_column('property', sa.Column('geo_cell', sa.Integer(), sa.Computed(GEO_CELL, persisted=True),
+                                        nullable=True))
+    op.add_column('property', sa.Column('geo_cell_coarse', sa.Integer(),
+                                        sa.Computed(GEO_CELL_COARSE, persisted=True), nullable=True))
+
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, 'property', columns, unique=False,
+                            postgresql_where=sa.text('is_approved'),
+                            postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='property', postgresql_concurrently=True, if_exists=True)
+    op.drop_column('property', 'geo_cell_coarse')
+    op.drop_column('property', 'geo_cell')
+    op.drop_column('property', 'longitude')
+    op.drop_column('property', 'latitude')
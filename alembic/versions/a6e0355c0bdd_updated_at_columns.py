@@ -0,0 +1,35 @@
+"""updated_at columns
+
+Revision ID: a6e0355c0bdd
+Revises: 6cbe25931c4f
+Create Date: 2026-10-18 15:40:21.664013
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6e0355c0bdd'
+down_revision: Union[str, None] = '6cbe25931c4f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLES = ['property', 'property_images', 'review']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CURRENT_TIMESTAMP is stable within the statement, so PostgreSQL 11+ adds it without a rewrite
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(),
+                                       server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in reversed(TABLES):
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,46 @@
+"""host inbox
+
+Revision ID: bcacfa1c344c
+Revises: c7c85b8ce6cc
+Create Date: 2026-10-18 14:48:05.913260
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bcacfa1c344c'
+down_revision: Union[str, None] = 'c7c85b8ce6cc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('ix_message_host_id', ['host_id', 'id']),
+    ('ix_message_host_status', ['host_id', 'status', 'id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # create_booking used to leave host_id empty; take it from the property owner
+    op.execute(
+        "UPDATE message SET host_id = p.owner_id "
+        "FROM booking b JOIN property p ON p.id = b.property_id "
+        "WHERE b.id = message.booking_id AND message.host_id IS DISTINCT FROM p.owner_id"
+    )
+
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, 'message', columns, unique=False,
+                            postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, columns in reversed(INDEXES):
+            op.drop_index(name, table_name='message', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,59 @@
+"""hot path indexes
+
+Revision ID: c4428811bb28
+Revises: 18b4b790e063
+Create Date: 2026-10-18 10:12:41.220913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4428811bb28'
+down_revision: Union[str, None] = '18b4b790e063'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# name, table, columns, partial predicate -- keep in sync with __table_args__ in db/models.py
+INDEXES = [
+    ('ix_property_owner_id', 'property', ['owner_id'], None),
+    ('ix_property_approved_price', 'property', ['price_per_night', 'id'], 'is_approved'),
+    ('ix_property_approved_created', 'property', ['created_at', 'id'], 'is_approved'),
+    ('ix_booking_approved_property_dates', 'booking', ['property_id', 'check_in', 'check_out'],
+     "status = 'approved'"),
+    ('ix_booking_guest_property', 'booking', ['guest_id', 'property_id'], None),
+    ('ix_review_property_guest', 'review', ['property_id', 'guest_id'], None),
+    ('ix_refresh_token_token', 'refresh_token', ['token'], None),
+    ('ix_message_booking_id', 'message', ['booking_id'], None),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # constant defaults are metadata-only on PostgreSQL 11+, no table rewrite
+    op.add_column('property', sa.Column('is_approved', sa.Boolean(), server_default=sa.text('false'),
+                                        nullable=False))
+    op.add_column('property', sa.Column('created_at', sa.DateTime(),
+                                        server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False))
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(name, table, columns, unique=False,
+                            postgresql_where=sa.text(where) if where else None,
+                            postgresql_concurrently=True,
+                            if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+    op.drop_column('property', 'created_at')
+    op.drop_column('property', 'is_approved')
@@ -0,0 +1,45 @@
+"""admin stats
+
+Revision ID: c7c85b8ce6cc
+Revises: 2bfc99eaaf18
+Create Date: 2026-10-18 14:21:37.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7c85b8ce6cc'
+down_revision: Union[str, None] = '2bfc99eaaf18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('booking', sa.Column('total_price', sa.Integer(), server_default=sa.text('0'), nullable=False))
+    op.execute(
+        "UPDATE booking SET total_price = p.price_per_night "
+        "* GREATEST(1, EXTRACT(DAY FROM booking.check_out - booking.check_in))::int "
+        "FROM property p WHERE p.id = booking.property_id"
+    )
+    op.create_table('admin_stats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('total_users', sa.Integer(), nullable=False),
+    sa.Column('active_users', sa.Integer(), nullable=False),
+    sa.Column('total_bookings', sa.Integer(), nullable=False),
+    sa.Column('active_bookings', sa.Integer(), nullable=False),
+    sa.Column('total_revenue', sa.BigInteger(), nullable=False),
+    sa.Column('popular_cities', sa.JSON(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('admin_stats')
+    op.drop_column('booking', 'total_price')
@@ -0,0 +1,35 @@
+"""property occupancy
+
+Revision ID: de7ef0bdfee5
+Revises: 1498c6c9722b
+Create Date: 2026-10-18 18:03:15.550917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'de7ef0bdfee5'
+down_revision: Union[str, None] = '1498c6c9722b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # filled from approved bookings by POST /admin/occupancy/rebuild after the upgrade
+    op.create_table('property_occupancy',
+    sa.Column('property_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('nights', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['property_id'], ['property.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('property_id', 'year')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('property_occupancy')
@@ -0,0 +1,45 @@
+"""Shared setup for the benchmarks in this directory.
+
+Import this before anything from airbnb_app: it points the app at a scratch
+database -- a temporary SQLite file, or BENCH_DATABASE_URL (an async URL of
+a database the benchmark may wipe) -- and the benchmarks talk to the app
+in-process through httpx's ASGI transport.
+"""
+import os
+import tempfile
+import time
+
+BENCH_DATABASE_URL = os.getenv('BENCH_DATABASE_URL')
+os.environ['ASYNC_DB_URL'] = BENCH_DATABASE_URL or 'sqlite+aiosqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+os.environ['DB_URL'] = 'sqlite://'
+os.environ.pop('ASYNC_REPLICA_DB_URL', None)
+os.environ.setdefault('SECRET_KEY', 'bench-secret')
+
+import httpx
+from sqlalchemy import text
+from airbnb_app.main import airbnb_app
+from airbnb_app.db.database import Base, async_engine
+
+
+async def reset_schema():
+    async with async_engine.begin() as conn:
+        if async_engine.dialect.name == 'postgresql':
+            await conn.execute(text('CREATE EXTENSION IF NOT EXISTS btree_gist'))
+            await conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+def client(timeout: float = 60) -> httpx.AsyncClient:
+    # app errors come back as 500s, as from a real server
+    transport = httpx.ASGITransport(app=airbnb_app, raise_app_exceptions=False)
+    return httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=timeout)
+
+
+async def per_call_ms(func, repeat: int, warmup: int = 5) -> float:
+    for _ in range(warmup):
+        await func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await func()
+    return (time.perf_counter() - start) / repeat * 1000
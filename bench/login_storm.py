@@ -0,0 +1,60 @@
+"""Login storm vs. latency of an unauthenticated endpoint (user-012).
+
+Fires LOGINS concurrent logins while polling GET /property/ and reports
+login throughput and the poll latency. ``inline`` runs bcrypt on the event
+loop, as before passwords.py moved it to a thread pool; ``pool`` is the
+current code.
+
+    python -m bench.login_storm [inline|pool] [logins]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from bench.common import client, reset_schema
+from airbnb_app.services import passwords
+
+USER = {'username': 'storm', 'email': 'storm@example.com', 'password': 'secret', 'role': 'guest',
+        'phone_number': None, 'avatar': None, 'create_date': '2025-01-01T00:00:00'}
+
+
+async def hash_inline(func, *args):
+    return func(*args)
+
+
+async def main(mode: str, logins: int):
+    if mode == 'inline':
+        passwords._run = hash_inline
+    await reset_schema()
+    async with client() as http:
+        await http.post('/auth/register', json=USER)
+        latencies = []
+        done = asyncio.Event()
+
+        async def poll():
+            while not done.is_set():
+                start = time.perf_counter()
+                await http.get('/property/')
+                latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.01)
+
+        poller = asyncio.create_task(poll())
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            http.post('/auth/login', json={'username': USER['username'], 'password': USER['password']})
+            for _ in range(logins)
+        ])
+        elapsed = time.perf_counter() - start
+        done.set()
+        await poller
+
+    codes = sorted({response.status_code for response in responses})
+    print(f'{mode}: {logins / elapsed:.1f} logins/s, status {codes}, '
+          f'GET /property/ p50 {statistics.median(latencies) * 1000:.1f} ms, '
+          f'max {max(latencies) * 1000:.1f} ms over {len(latencies)} polls')
+
+
+if __name__ == '__main__':
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else 'pool',
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 40))
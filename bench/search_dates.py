@@ -0,0 +1,116 @@
+"""Date-filtered property search over a seeded booking history (user-023).
+
+Seeds LISTINGS approved listings with about 46 stays each (70% approved,
+the rest pending/rejected/cancelled), checks that paging through
+/property/search/?check_in=&check_out= returns exactly the listings free
+on those dates, then times one 20-row page:
+
+- with dates: the NOT EXISTS anti-join on ix_booking_approved_property_check_out;
+- the same with the overlap index in its old (property_id, check_in, check_out) order;
+- without dates plus GET /property/{id}/availability/ per result, as the frontend did.
+
+The page cache is cleared before every request.
+
+    python -m bench.search_dates [listings]
+"""
+import asyncio
+import random
+import sys
+from datetime import datetime, timedelta
+
+from bench.common import client, per_call_ms, reset_schema
+from sqlalchemy import insert, text
+from airbnb_app.db.database import async_engine
+from airbnb_app.db.models import Booking, Property, UserProfile
+from airbnb_app.services.search_cache import search_cache
+
+STAYS_BEFORE, STAYS_AFTER = 40, 6
+PAGE = 20
+REPEAT = 50
+TODAY = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+CHECK_IN, CHECK_OUT = TODAY + timedelta(days=10), TODAY + timedelta(days=14)
+
+
+def booking_history(property_id: int, guest_id: int, rng: random.Random):
+    day = TODAY - timedelta(days=int(STAYS_BEFORE * 6.5))
+    for _ in range(STAYS_BEFORE + STAYS_AFTER):
+        day += timedelta(days=rng.randint(1, 5))
+        end = day + timedelta(days=rng.randint(1, 6))
+        status = 'approved' if rng.random() < 0.7 else rng.choice(['pending', 'rejected', 'cancelled'])
+        yield {'property_id': property_id, 'guest_id': guest_id, 'check_in': day, 'check_out': end,
+               'status': status, 'total_price': 0}
+        day = end
+
+
+async def seed(listings: int) -> list:
+    """Returns the ids of listings free on CHECK_IN..CHECK_OUT."""
+    rng = random.Random(5)
+    free = []
+    async with async_engine.begin() as conn:
+        owner_id, guest_id = (await conn.execute(insert(UserProfile).returning(UserProfile.id), [
+            {'username': name, 'email': f'{name}@example.com', 'password': 'x', 'role': name}
+            for name in ('host', 'guest')
+        ])).scalars()
+        property_ids = (await conn.execute(insert(Property).returning(Property.id), [{
+            'title': 't', 'description': 'd', 'price_per_night': 10 + i % 300, 'city': 'Bishkek',
+            'address': 'a', 'property_type': 'house', 'rules': 'no_smoking', 'max_guests': 2,
+            'bedrooms': 1, 'bathrooms': 1, 'is_active': True, 'is_approved': True, 'owner_id': owner_id,
+        } for i in range(listings)])).scalars().all()
+        rows = []
+        for property_id in property_ids:
+            history = list(booking_history(property_id, guest_id, rng))
+            if not any(row['status'] == 'approved' and row['check_in'] < CHECK_OUT and row['check_out'] > CHECK_IN
+                       for row in history):
+                free.append(property_id)
+            rows += history
+            if len(rows) >= 50000:
+                await conn.execute(insert(Booking), rows)
+                rows = []
+        if rows:
+            await conn.execute(insert(Booking), rows)
+    async with async_engine.connect() as conn:
+        await conn.execute(text('ANALYZE'))
+        await conn.commit()
+    return sorted(free)
+
+
+async def main(listings: int):
+    await reset_schema()
+    free = await seed(listings)
+    dates = {'check_in': CHECK_IN.isoformat(), 'check_out': CHECK_OUT.isoformat()}
+    async with client() as http:
+        found, cursor = [], None
+        while True:
+            response = await http.get('/property/search/', params={**dates, 'limit': 100,
+                                                                   **({'cursor': cursor} if cursor else {})})
+            found += [prop['id'] for prop in response.json()]
+            cursor = response.headers.get('x-next-cursor')
+            if not cursor:
+                break
+        print(f'{listings} listings, {listings * (STAYS_BEFORE + STAYS_AFTER)} bookings, '
+              f'{len(free)} free on the dates, search returns the same set: {sorted(found) == free}')
+
+        async def dated_page():
+            search_cache.clear()
+            await http.get('/property/search/', params={**dates, 'order_by': 'price_asc', 'limit': PAGE})
+
+        async def page_then_probes():
+            search_cache.clear()
+            page = (await http.get('/property/search/', params={'order_by': 'price_asc', 'limit': PAGE})).json()
+            for prop in page:
+                await http.get(f"/property/{prop['id']}/availability/",
+                               params={'start': CHECK_IN.date().isoformat(), 'end': CHECK_OUT.date().isoformat()})
+
+        print(f'ms per {PAGE}-row page:')
+        print(f'  with dates: {await per_call_ms(dated_page, REPEAT):.2f}')
+        probes = await per_call_ms(page_then_probes, REPEAT)
+        async with async_engine.begin() as conn:
+            await conn.execute(text('DROP INDEX ix_booking_approved_property_check_out'))
+            await conn.execute(text('CREATE INDEX ix_booking_approved_property_check_in '
+                                    "ON booking (property_id, check_in, check_out) WHERE status = 'approved'"))
+        print(f'  with dates, old index order: {await per_call_ms(dated_page, REPEAT):.2f}')
+        print(f'  without dates + availability per result: {probes:.2f}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
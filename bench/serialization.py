@@ -0,0 +1,71 @@
+"""Serializing a 100-property page: pydantic vs. column tuples + orjson (user-017).
+
+``pydantic`` is what FastAPI does for a ``response_model``: load ORM
+objects, validate them into the schema, jsonable_encoder, json.dumps.
+``rows`` is services/serialization.py: a column-tuple select encoded by
+RowEncoder. Each is timed end to end (query included) and encode-only.
+
+    python -m bench.serialization [rows]
+"""
+import asyncio
+import json
+import sys
+from datetime import datetime
+from typing import List
+
+from bench.common import per_call_ms, reset_schema
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+from airbnb_app.db.database import AsyncSessionLocal, async_engine
+from airbnb_app.db.models import Property, UserProfile
+from airbnb_app.db.schema import PropertySchema
+from airbnb_app.services.search_cache import property_rows
+from airbnb_app.services.serialization import orjson
+
+REPEAT = 300
+
+page = TypeAdapter(List[PropertySchema])
+
+
+def pydantic_dumps(properties) -> bytes:
+    return json.dumps(jsonable_encoder(page.validate_python(properties, from_attributes=True))).encode()
+
+
+async def main(size: int):
+    await reset_schema()
+    async with async_engine.begin() as conn:
+        owner_id = (await conn.execute(insert(UserProfile).returning(UserProfile.id), {
+            'username': 'host', 'email': 'host@example.com', 'password': 'x', 'role': 'host'})).scalar_one()
+        await conn.execute(insert(Property), [{
+            'title': f'title {i}', 'description': 'd' * 200, 'price_per_night': i, 'city': 'Bishkek',
+            'address': 'a' * 40, 'property_type': 'house', 'rules': 'no_smoking', 'max_guests': 3,
+            'bedrooms': 1, 'bathrooms': 1, 'is_active': True, 'is_approved': True, 'owner_id': owner_id,
+            'rating_avg': 4.5, 'created_at': datetime(2025, 1, 1),
+        } for i in range(size)])
+
+    async with AsyncSessionLocal() as db:
+        async def pydantic_total():
+            return pydantic_dumps((await db.scalars(select(Property).limit(size))).all())
+
+        async def rows_total():
+            return property_rows.dumps((await db.execute(property_rows.select().limit(size))).all())
+
+        properties = (await db.scalars(select(Property).limit(size))).all()
+        rows = (await db.execute(property_rows.select().limit(size))).all()
+        assert json.loads(pydantic_dumps(properties)) == json.loads(property_rows.dumps(rows))
+
+        async def pydantic_encode():
+            return pydantic_dumps(properties)
+
+        async def rows_encode():
+            return property_rows.dumps(rows)
+
+        print(f'{size} rows, {"orjson" if orjson else "stdlib json"}, ms per page:')
+        for name, func in [('pydantic, query + encode', pydantic_total), ('rows, query + encode', rows_total),
+                           ('pydantic, encode only', pydantic_encode), ('rows, encode only', rows_encode)]:
+            print(f'  {name}: {await per_call_ms(func, REPEAT):.2f}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100))
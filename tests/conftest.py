@@ -0,0 +1,75 @@
+"""Test setup: a throwaway SQLite file, or PostgreSQL when TEST_DATABASE_URL is set.
+
+TEST_DATABASE_URL is an async URL (postgresql+asyncpg://...) of an empty
+database the tests may drop and recreate tables in; tests that need
+PostgreSQL-only constraints are skipped without it. Requests go through
+httpx's ASGI transport on the test's own event loop, so the app's engine
+and the test share one loop (asyncpg requires that).
+"""
+import os
+import tempfile
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+os.environ['ASYNC_DB_URL'] = TEST_DATABASE_URL or 'sqlite+aiosqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+# the sync engine is built at import time but not used by the API
+os.environ['DB_URL'] = 'sqlite://'
+os.environ.pop('ASYNC_REPLICA_DB_URL', None)
+os.environ.setdefault('SECRET_KEY', 'test-secret')
+os.environ.setdefault('BCRYPT_ROUNDS', '4')
+
+import httpx
+import pytest
+from sqlalchemy import insert, text
+from airbnb_app.main import airbnb_app
+from airbnb_app.db.database import Base, async_engine
+from airbnb_app.db.models import Property
+from airbnb_app.services.availability import availability_index
+from airbnb_app.services.principals import principal_cache
+from airbnb_app.services.search_cache import search_cache
+
+
+IS_POSTGRES = async_engine.dialect.name == 'postgresql'
+
+requires_postgres = pytest.mark.skipif(not IS_POSTGRES, reason='needs TEST_DATABASE_URL (PostgreSQL)')
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+@pytest.fixture
+async def client():
+    availability_index.clear()
+    principal_cache.clear()
+    search_cache.clear()
+    async with async_engine.begin() as conn:
+        if IS_POSTGRES:
+            await conn.execute(text('CREATE EXTENSION IF NOT EXISTS btree_gist'))
+            await conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=airbnb_app), base_url='http://test') as client:
+        yield client
+    await async_engine.dispose()
+
+
+async def register(client, username: str, role: str) -> dict:
+    """Registers and logs in, returns the Authorization header."""
+    await client.post('/auth/register', json={
+        'username': username, 'email': f'{username}@example.com', 'password': 'secret', 'role': role,
+        'phone_number': None, 'avatar': None, 'create_date': '2025-01-01T00:00:00',
+    })
+    response = await client.post('/auth/login', json={'username': username, 'password': 'secret'})
+    return {'Authorization': f"Bearer {response.json()['access_token']}"}
+
+
+async def add_properties(owner_id: int, count: int = 1) -> list:
+    """Approved properties inserted directly, returns their ids."""
+    async with async_engine.begin() as conn:
+        result = await conn.execute(insert(Property).returning(Property.id), [{
+            'title': f'Flat {i}', 'description': 'd', 'price_per_night': 50, 'city': 'Bishkek',
+            'address': 'a', 'property_type': 'apartment', 'rules': 'no_smoking', 'max_guests': 2,
+            'bedrooms': 1, 'bathrooms': 1, 'is_active': True, 'is_approved': True, 'owner_id': owner_id,
+        } for i in range(count)])
+        return list(result.scalars())
@@ -0,0 +1,62 @@
+"""PropertyCalendar against brute force, and /availability/ before the index horizon."""
+import random
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import insert
+from airbnb_app.db.database import async_engine
+from airbnb_app.db.models import UserProfile, Booking
+from airbnb_app.services.availability import PropertyCalendar, availability_index
+from tests.conftest import add_properties
+
+BASE = datetime(2026, 1, 1)
+
+
+def test_calendar_matches_brute_force():
+    rng = random.Random(7)
+    calendar, stays = PropertyCalendar(), {}
+    for _ in range(2000):
+        booking_id = rng.randrange(60)
+        if rng.random() < 0.3:
+            assert calendar.discard(booking_id) == (booking_id in stays)
+            stays.pop(booking_id, None)
+        else:
+            check_in = BASE + timedelta(days=rng.randrange(300))
+            check_out = check_in + timedelta(days=rng.randint(1, 20))
+            calendar.add(booking_id, check_in, check_out)
+            stays[booking_id] = (check_in, check_out)
+
+        start = BASE + timedelta(days=rng.randrange(320))
+        end = start + timedelta(days=rng.randint(1, 30))
+        expected = sorted((a, b, i) for i, (a, b) in stays.items() if a < end and b > start)
+        assert calendar.booked(start, end) == expected
+        assert calendar.overlaps(start, end) == bool(expected)
+    assert len(calendar) == len(stays)
+
+
+@pytest.mark.anyio
+async def test_past_window_is_read_from_table(client):
+    async with async_engine.begin() as conn:
+        host_id, guest_id = (await conn.execute(insert(UserProfile).returning(UserProfile.id), [
+            {'username': name, 'email': f'{name}@example.com', 'password': 'x', 'role': name}
+            for name in ('host', 'guest')
+        ])).scalars()
+    property_id, = await add_properties(host_id)
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    past = (today - timedelta(days=20), today - timedelta(days=15))
+    upcoming = (today + timedelta(days=5), today + timedelta(days=8))
+    async with async_engine.begin() as conn:
+        await conn.execute(insert(Booking), [
+            {'property_id': property_id, 'guest_id': guest_id, 'check_in': check_in, 'check_out': check_out,
+             'status': 'approved', 'total_price': 0} for check_in, check_out in (past, upcoming)
+        ])
+
+    response = await client.get(f'/property/{property_id}/availability/', params={
+        'start': (today - timedelta(days=30)).date().isoformat(),
+        'end': (today + timedelta(days=30)).date().isoformat()})
+    assert response.status_code == 200
+    booked = [(datetime.fromisoformat(stay['check_in']), datetime.fromisoformat(stay['check_out']))
+              for stay in response.json()['booked']]
+    assert booked == [past, upcoming]
+    # the index itself starts at its load and only holds the upcoming stay
+    assert availability_index.horizon > past[1]
+    assert [stay[:2] for stay in availability_index.booked(property_id, BASE, today + timedelta(days=60))] == [upcoming]
@@ -0,0 +1,125 @@
+"""Concurrent approvals: booking_approved_no_overlap lets one of several
+overlapping approvals through, and approvals on other properties do not wait.
+
+The gather() rounds are a stress test: how far requests interleave depends on
+scheduling. test_open_approval_blocks_only_its_property pins the ordering
+with a held transaction, so it fails on every run without the constraint.
+"""
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import insert, select, update, func
+from airbnb_app.db.database import async_engine
+from airbnb_app.db.models import UserProfile, Booking, Message, BookingStatusChoices
+from tests.conftest import register, add_properties, requires_postgres
+
+pytestmark = [pytest.mark.anyio, requires_postgres]
+
+CHECK_IN = datetime.utcnow().replace(hour=14, minute=0, second=0, microsecond=0) + timedelta(days=30)
+APPROVE = {'new_status': 'approved'}
+
+
+@pytest.fixture
+async def users(client):
+    host = await register(client, 'host', 'host')
+    await register(client, 'guest', 'guest')
+    async with async_engine.connect() as conn:
+        ids = dict((await conn.execute(select(UserProfile.username, UserProfile.id))).all())
+    return host, ids['host'], ids['guest']
+
+
+async def add_requests(host_id: int, guest_id: int, stays: list) -> list:
+    """Pending bookings with their host messages, returns (booking_id, message_id) pairs."""
+    async with async_engine.begin() as conn:
+        booking_ids = (await conn.execute(insert(Booking).returning(Booking.id), [
+            {'property_id': property_id, 'guest_id': guest_id, 'check_in': check_in,
+             'check_out': check_out, 'total_price': 100, 'status': 'pending'}
+            for property_id, check_in, check_out in stays
+        ])).scalars().all()
+        message_ids = (await conn.execute(insert(Message).returning(Message.id), [
+            {'booking_id': booking_id, 'host_id': host_id, 'status': 'pending'} for booking_id in booking_ids
+        ])).scalars().all()
+    return list(zip(booking_ids, message_ids))
+
+
+async def warm_pool(size: int):
+    """Open ``size`` pooled connections up front, so concurrent requests start together
+    instead of the first one finishing while the rest are still connecting (and
+    looking up the enum types on their first query)."""
+    connections = await asyncio.gather(*[async_engine.connect() for _ in range(size)])
+    for conn in connections:
+        await conn.execute(select(Booking.status, Message.status).limit(1))
+        await conn.close()
+
+
+async def approved_count(property_id: int) -> int:
+    async with async_engine.connect() as conn:
+        return await conn.scalar(select(func.count(Booking.id)).where(
+            Booking.property_id == property_id, Booking.status == BookingStatusChoices.approved))
+
+
+@pytest.mark.parametrize('round', range(5))
+async def test_overlapping_approvals_one_wins(client, users, round):
+    host, host_id, guest_id = users
+    property_id, = await add_properties(host_id)
+    # every request overlaps every other one by at least a night
+    requests = await add_requests(host_id, guest_id, [
+        (property_id, CHECK_IN + timedelta(days=i % 3), CHECK_IN + timedelta(days=4 + i % 3)) for i in range(12)
+    ])
+    await warm_pool(len(requests))
+
+    responses = await asyncio.gather(*[
+        client.post(f'/messages/{message_id}/approve', json=APPROVE, headers=host) for _, message_id in requests
+    ])
+
+    assert sorted(response.status_code for response in responses) == [200] + [409] * 11
+    assert await approved_count(property_id) == 1
+
+
+async def test_approvals_on_different_properties_all_succeed(client, users):
+    host, host_id, guest_id = users
+    property_ids = await add_properties(host_id, 8)
+    requests = await add_requests(host_id, guest_id, [
+        (property_id, CHECK_IN, CHECK_IN + timedelta(days=4)) for property_id in property_ids
+    ])
+    await warm_pool(len(requests))
+
+    responses = await asyncio.gather(*[
+        client.post(f'/messages/{message_id}/approve', json=APPROVE, headers=host) for _, message_id in requests
+    ])
+
+    assert [response.status_code for response in responses] == [200] * 8
+    for property_id in property_ids:
+        assert await approved_count(property_id) == 1
+
+
+async def test_open_approval_blocks_only_its_property(client, users):
+    host, host_id, guest_id = users
+    first_id, second_id = await add_properties(host_id, 2)
+    (held_booking, _), (_, rival_message), (_, other_message) = await add_requests(host_id, guest_id, [
+        (first_id, CHECK_IN, CHECK_IN + timedelta(days=4)),
+        (first_id, CHECK_IN + timedelta(days=2), CHECK_IN + timedelta(days=6)),
+        (second_id, CHECK_IN, CHECK_IN + timedelta(days=4)),
+    ])
+
+    async with async_engine.connect() as held:
+        # an approval on the first property, not committed yet
+        await held.execute(update(Booking).where(Booking.id == held_booking)
+                           .values(status=BookingStatusChoices.approved))
+
+        # the same dates on another property do not wait for it
+        other = await asyncio.wait_for(
+            client.post(f'/messages/{other_message}/approve', json=APPROVE, headers=host), timeout=5)
+        assert other.status_code == 200
+
+        # an overlapping approval on the same property waits for the open one ...
+        rival = asyncio.ensure_future(
+            client.post(f'/messages/{rival_message}/approve', json=APPROVE, headers=host))
+        done, _ = await asyncio.wait([rival], timeout=1)
+        assert not done
+        await held.commit()
+
+    # ... and loses once it commits
+    assert (await asyncio.wait_for(rival, timeout=5)).status_code == 409
+    assert await approved_count(first_id) == 1
+    assert await approved_count(second_id) == 1
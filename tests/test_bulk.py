@@ -0,0 +1,75 @@
+"""Bulk creates: database rejections come back per item, nothing is stored."""
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert, select, func
+from airbnb_app.db.database import AsyncSessionLocal, async_engine
+from airbnb_app.db.models import Property, PropertyImages, UserProfile
+from airbnb_app.services.bulk import insert_items
+from tests.conftest import register, add_properties, requires_postgres
+
+pytestmark = pytest.mark.anyio
+
+PROPERTY = {'title': 'Flat', 'description': 'd', 'price_per_night': 50, 'city': 'Bishkek', 'address': 'a',
+            'property_type': 'apartment', 'rules': 'no_smoking', 'max_guests': 2, 'bedrooms': 1,
+            'bathrooms': 1, 'is_active': True, 'owner_id': 0}
+
+
+async def count(model) -> int:
+    async with async_engine.connect() as conn:
+        return await conn.scalar(select(func.count()).select_from(model))
+
+
+# pysqlite keeps SAVEPOINTs outside its lazy transaction, so the replay needs PostgreSQL
+@requires_postgres
+async def test_constraint_violation_names_the_item(client):
+    await register(client, 'host', 'host')
+    property_id, = await add_properties(1)
+    statement = insert(PropertyImages).returning(PropertyImages.id, sort_by_parameter_order=True)
+    images = [{'image_url': f'/media/{i}.jpg', 'property_id': property_id, 'content_hash': 'same' if i % 2 else str(i)}
+              for i in range(4)]
+
+    async with AsyncSessionLocal() as db:
+        with pytest.raises(HTTPException) as error:
+            await insert_items(db, statement, images)
+    # item 1 is accepted on its own; 3 repeats its hash
+    assert error.value.status_code == 409
+    assert [item['index'] for item in error.value.detail] == [3]
+    assert await count(PropertyImages) == 0
+
+
+async def test_clean_batch_inserts_in_order(client):
+    await register(client, 'host', 'host')
+    property_id, = await add_properties(1)
+    statement = insert(PropertyImages).returning(PropertyImages.image_url, sort_by_parameter_order=True)
+    async with AsyncSessionLocal() as db:
+        rows = await insert_items(db, statement, [{'image_url': f'/media/{i}.jpg', 'property_id': property_id}
+                                                  for i in range(3)])
+        await db.commit()
+    assert [row.image_url for row in rows] == ['/media/0.jpg', '/media/1.jpg', '/media/2.jpg']
+
+
+@requires_postgres
+async def test_bulk_property_value_too_long(client):
+    host = await register(client, 'host', 'host')
+    response = await client.post('/property/create/bulk/', headers=host,
+                                 json=[PROPERTY, {**PROPERTY, 'title': 'x' * 100}, PROPERTY])
+    assert response.status_code == 422
+    assert response.json()['detail'] == [{'index': 1, 'detail': 'Недопустимое значение для базы'}]
+    assert await count(Property) == 0
+
+
+@requires_postgres
+async def test_bulk_images_missing_property(client):
+    host = await register(client, 'host', 'host')
+    async with async_engine.connect() as conn:
+        host_id = await conn.scalar(select(UserProfile.id))
+    property_id, = await add_properties(host_id)
+    statement = insert(PropertyImages).returning(PropertyImages.id, sort_by_parameter_order=True)
+    async with AsyncSessionLocal() as db:
+        with pytest.raises(HTTPException) as error:
+            # the property a check saw is gone by the insert
+            await insert_items(db, statement, [{'image_url': 'a', 'property_id': property_id},
+                                               {'image_url': 'b', 'property_id': property_id + 1}])
+    assert error.value.status_code == 409
+    assert [item['index'] for item in error.value.detail] == [1]
+    assert await count(PropertyImages) == 0
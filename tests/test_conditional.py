@@ -0,0 +1,90 @@
+"""Conditional GET of list pages: a revalidation that misses the page cache
+costs one aggregate, and the ETag moves whenever the page would."""
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event, insert, select, update
+from airbnb_app.db.database import async_engine
+from airbnb_app.db.models import Booking, Property, UserProfile
+from airbnb_app.services.search_cache import search_cache
+from tests.conftest import add_properties
+
+pytestmark = pytest.mark.anyio
+
+CHECK_IN = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=10)
+DATES = {'check_in': CHECK_IN.isoformat(), 'check_out': (CHECK_IN + timedelta(days=3)).isoformat()}
+
+
+@pytest.fixture
+async def property_ids(client):
+    async with async_engine.begin() as conn:
+        host_id = (await conn.execute(insert(UserProfile).returning(UserProfile.id), {
+            'username': 'host', 'email': 'host@example.com', 'password': 'x', 'role': 'host'})).scalar_one()
+    return await add_properties(host_id, 4)
+
+
+@pytest.fixture
+def statements():
+    seen = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(async_engine.sync_engine, 'before_cursor_execute', count)
+    yield seen
+    event.remove(async_engine.sync_engine, 'before_cursor_execute', count)
+
+
+async def revalidate(client, path, params, etag, statements):
+    """Request with If-None-Match as another worker would see it: nothing cached."""
+    search_cache.clear()
+    statements.clear()
+    return await client.get(path, params=params, headers={'If-None-Match': etag})
+
+
+@pytest.mark.parametrize('path, params', [
+    ('/property/', {'limit': 2}),
+    ('/property/search/', {'limit': 2, 'order_by': 'price_asc'}),
+    ('/property/search/', {'limit': 2, **DATES}),
+])
+async def test_unchanged_page_is_one_aggregate(client, property_ids, statements, path, params):
+    first = await client.get(path, params=params)
+    etag = first.headers['etag']
+    # a cache hit and a fresh load agree on the ETag
+    assert (await client.get(path, params=params)).headers['etag'] == etag
+    search_cache.clear()
+    assert (await client.get(path, params=params)).headers['etag'] == etag
+
+    response = await revalidate(client, path, params, etag, statements)
+    assert response.status_code == 304
+    assert response.headers['etag'] == etag
+    # the version aggregate only, no row bodies
+    assert len(statements) == 1
+    assert 'count(' in statements[0].lower() and 'description' not in statements[0].split('FROM')[0]
+
+
+async def test_page_changes_move_etag(client, property_ids, statements):
+    params = {'limit': 2, **DATES}
+    etag = (await client.get('/property/search/', params=params)).headers['etag']
+
+    # a row outside the page (past the look-ahead row) does not matter
+    async with async_engine.begin() as conn:
+        await conn.execute(update(Property).where(Property.id == property_ids[3]).values(title='x'))
+    assert (await revalidate(client, '/property/search/', params, etag, statements)).status_code == 304
+
+    # an edit of a row on the page
+    async with async_engine.begin() as conn:
+        await conn.execute(update(Property).where(Property.id == property_ids[0]).values(title='renamed'))
+    response = await revalidate(client, '/property/search/', params, etag, statements)
+    assert response.status_code == 200
+    assert response.json()[0]['title'] == 'renamed'
+    etag = response.headers['etag']
+
+    # an approved booking takes a listing off the dated page
+    async with async_engine.begin() as conn:
+        guest_id = await conn.scalar(select(UserProfile.id))
+        await conn.execute(insert(Booking), {
+            'property_id': property_ids[1], 'guest_id': guest_id, 'check_in': CHECK_IN,
+            'check_out': CHECK_IN + timedelta(days=2), 'status': 'approved', 'total_price': 0})
+    response = await revalidate(client, '/property/search/', params, etag, statements)
+    assert response.status_code == 200
+    assert [prop['id'] for prop in response.json()] == [property_ids[0], property_ids[2]]
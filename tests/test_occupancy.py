@@ -0,0 +1,79 @@
+"""Window checks shared by /availability/ and /occupancy/, and rebuild_occupancy() against a concurrent refresh."""
+import asyncio
+from datetime import date, datetime
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.sql.dml import Delete
+from airbnb_app.db.database import AsyncSessionLocal, async_engine
+from airbnb_app.db.models import UserProfile, Booking, PropertyOccupancy
+from airbnb_app.services import occupancy
+from tests.conftest import add_properties, requires_postgres
+
+pytestmark = pytest.mark.anyio
+
+
+async def add_guest_and_property():
+    async with async_engine.begin() as conn:
+        host_id, guest_id = (await conn.execute(insert(UserProfile).returning(UserProfile.id), [
+            {'username': name, 'email': f'{name}@example.com', 'password': 'x', 'role': name}
+            for name in ('host', 'guest')
+        ])).scalars()
+    property_id, = await add_properties(host_id)
+    return guest_id, property_id
+
+
+async def book(property_id: int, guest_id: int, check_in: datetime, check_out: datetime):
+    async with async_engine.begin() as conn:
+        await conn.execute(insert(Booking).values(property_id=property_id, guest_id=guest_id, check_in=check_in,
+                                                  check_out=check_out, status='approved', total_price=0))
+
+
+@pytest.mark.parametrize('endpoint', ['availability', 'occupancy'])
+async def test_window_checks(client, endpoint):
+    _, property_id = await add_guest_and_property()
+    cases = [
+        (property_id, '2026-03-01', '2026-03-01', 400, 'end должен быть позже start'),
+        (property_id, '2026-03-01', '2027-03-03', 400, 'Максимум 366 дней'),
+        (property_id + 1, '2026-03-01', '2026-04-01', 404, 'Property не найден'),
+    ]
+    for target, start, end, status, detail in cases:
+        response = await client.get(f'/property/{target}/{endpoint}/', params={'start': start, 'end': end})
+        assert (response.status_code, response.json()['detail']) == (status, detail)
+    response = await client.get(f'/property/{property_id}/{endpoint}/',
+                                params={'start': '2026-03-01', 'end': '2026-04-01'})
+    assert response.status_code == 200
+
+
+@requires_postgres
+async def test_rebuild_does_not_overwrite_concurrent_refresh(client):
+    guest_id, property_id = await add_guest_and_property()
+    await book(property_id, guest_id, datetime(2026, 3, 1), datetime(2026, 3, 3))
+
+    # hold the rebuild between reading the bookings and replacing the table
+    bookings_read, resume = asyncio.Event(), asyncio.Event()
+    async with AsyncSessionLocal() as rebuild_db, AsyncSessionLocal() as refresh_db:
+        execute = rebuild_db.execute
+
+        async def paused_execute(statement, *args, **kwargs):
+            if isinstance(statement, Delete):
+                bookings_read.set()
+                await resume.wait()
+            return await execute(statement, *args, **kwargs)
+
+        rebuild_db.execute = paused_execute
+        rebuild = asyncio.create_task(occupancy.rebuild_occupancy(rebuild_db))
+        await bookings_read.wait()
+
+        # approved after the rebuild's snapshot; its refresh must land after the rebuild
+        await book(property_id, guest_id, datetime(2026, 3, 10), datetime(2026, 3, 12))
+        refresh = asyncio.create_task(occupancy.refresh_occupancy(refresh_db, property_id, [2026]))
+        await asyncio.sleep(0.3)
+        assert not refresh.done()
+        resume.set()
+        assert await rebuild == 1
+        await refresh
+
+    async with async_engine.connect() as conn:
+        nights = await conn.scalar(select(PropertyOccupancy.nights).where(PropertyOccupancy.property_id == property_id))
+    assert occupancy.days(occupancy.from_bytes(nights), date(2026, 1, 1)) == [
+        date(2026, 3, 1), date(2026, 3, 2), date(2026, 3, 10), date(2026, 3, 11)]
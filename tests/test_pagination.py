@@ -0,0 +1,53 @@
+"""Cursor tokens: valid ones page through, tampered ones are a 400, never a 500."""
+import pytest
+from sqlalchemy import insert
+from airbnb_app.db.database import async_engine
+from airbnb_app.db.models import UserProfile
+from airbnb_app.services.pagination import encode_cursor
+from tests.conftest import add_properties
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def properties(client):
+    async with async_engine.begin() as conn:
+        host_id = (await conn.execute(insert(UserProfile).returning(UserProfile.id), {
+            'username': 'host', 'email': 'host@example.com', 'password': 'x', 'role': 'host'})).scalar_one()
+    return await add_properties(host_id, 5)
+
+
+@pytest.mark.parametrize('order_by', ['id', 'price_asc', 'date_desc', 'rating_desc'])
+async def test_pages_follow_cursor(client, properties, order_by):
+    seen, cursor = [], None
+    while True:
+        response = await client.get('/property/search/', params={
+            'order_by': order_by, 'limit': 2, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        seen += [prop['id'] for prop in response.json()]
+        cursor = response.headers.get('x-next-cursor')
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(properties)
+
+
+@pytest.mark.parametrize('order_by, cursor', [
+    ('price_asc', 'not a cursor!'),
+    ('price_asc', encode_cursor('price_asc', 'cheap', 1)),
+    ('price_asc', encode_cursor('price_asc', None, 1)),
+    ('price_asc', encode_cursor('price_asc', True, 1)),
+    ('price_asc', encode_cursor('price_asc', 10, 'one')),
+    ('date_desc', encode_cursor('date_desc', 'yesterday', 1)),
+    ('date_desc', encode_cursor('date_desc', 20250101, 1)),
+    ('rating_desc', encode_cursor('rating_desc', [4.5], 1)),
+    ('id', encode_cursor('price_asc', 10, 1)),
+])
+async def test_tampered_cursor_is_400(client, properties, order_by, cursor):
+    response = await client.get('/property/search/', params={'order_by': order_by, 'cursor': cursor})
+    assert response.status_code == 400
+
+
+async def test_float_sort_accepts_int_key(client, properties):
+    response = await client.get('/property/search/', params={
+        'order_by': 'rating_desc', 'cursor': encode_cursor('rating_desc', 4, properties[0])})
+    assert response.status_code == 200
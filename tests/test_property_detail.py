@@ -0,0 +1,70 @@
+"""GET /property/{id}/?include=... issues 1 probe + 1 + one per included collection."""
+import pytest
+from sqlalchemy import event, insert
+from airbnb_app.db.database import async_engine
+from airbnb_app.db.models import UserProfile, PropertyImages, Review
+from tests.conftest import add_properties
+
+pytestmark = pytest.mark.anyio
+
+IMAGES = 30
+REVIEWS = 50
+
+
+@pytest.fixture
+async def property_id(client):
+    async with async_engine.begin() as conn:
+        host_id, guest_id = (await conn.execute(insert(UserProfile).returning(UserProfile.id), [
+            {'username': name, 'email': f'{name}@example.com', 'password': 'x', 'role': role}
+            for name, role in (('host', 'host'), ('guest', 'guest'))
+        ])).scalars()
+    # a neighbour with its own rows: selectin must not pick them up
+    property_id, other_id = await add_properties(host_id, 2)
+    async with async_engine.begin() as conn:
+        for pid in (property_id, other_id):
+            await conn.execute(insert(PropertyImages), [
+                {'image_url': f'/media/{pid}-{i}.jpg', 'property_id': pid} for i in range(IMAGES)
+            ])
+            await conn.execute(insert(Review), [
+                {'comment': 'ok', 'rating': 1 + i % 5, 'property_id': pid, 'guest_id': guest_id}
+                for i in range(REVIEWS)
+            ])
+    return property_id
+
+
+@pytest.fixture
+def statements():
+    seen = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(async_engine.sync_engine, 'before_cursor_execute', count)
+    yield seen
+    event.remove(async_engine.sync_engine, 'before_cursor_execute', count)
+
+
+@pytest.mark.parametrize('include', [None, 'owner', 'images', 'reviews', 'owner,images,reviews'])
+async def test_detail_statement_count(client, property_id, statements, include):
+    includes = include.split(',') if include else []
+    response = await client.get(f'/property/{property_id}/', params={'include': include} if include else {})
+    assert response.status_code == 200
+    # probe + property (owner joined in) + one selectin per collection
+    collections = [name for name in includes if name != 'owner']
+    assert len(statements) == 1 + 1 + len(collections), statements
+
+    body = response.json()
+    assert body['id'] == property_id
+    assert set(body) & {'owner', 'images', 'reviews'} == set(includes)
+    if 'owner' in includes:
+        assert body['owner']['username'] == 'host'
+    if 'images' in includes:
+        assert len(body['images']) == IMAGES
+    if 'reviews' in includes:
+        assert len(body['reviews']) == REVIEWS
+
+
+async def test_unknown_include(client, property_id, statements):
+    response = await client.get(f'/property/{property_id}/', params={'include': 'bookings'})
+    assert response.status_code == 400
+    assert statements == []